@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+POLYLOG BENCHMARK - Modelle im Vergleich (Latenz + Antworten)
+
+Spielt einen Prompt-Satz über die PolylogBridge gegen alle lokal
+installierten Ollama-Modelle ab und misst pro Modell:
+  - Ladezeit (kalt, Modell wird vorher entladen)
+  - Time-to-first-token (Ollama: Ladezeit + Prompt-Auswertung)
+  - Tokens/s der Generierung
+  - Tool-Aufrufe und Inferenz-Runden bis zur Antwort
+
+Ergebnisse landen als JSON + Markdown-Tabelle in benchmark-results/,
+die Antworten auf den ersten Prompt zusätzlich als neue Datei in
+reaktionsbeispiele/ (mit Messwerten, vergleichbar über Modelle hinweg).
+
+Usage:
+    python polylog_benchmark.py                          # Alle installierten Modelle
+    python polylog_benchmark.py --models qwen2.5:3b devstral-small-2:latest
+    python polylog_benchmark.py --prompts prompts.txt    # Prompts durch Zeilen mit '---' getrennt
+    python polylog_benchmark.py --runs 3 --warm          # 3 Läufe, Modell nicht entladen
+
+Licensed under EUPL 1.2
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from polylog_bridge import BridgeConfig, PolylogBridge, _requests
+
+BASE_DIR = Path(__file__).parent
+RESULTS_DIR = BASE_DIR / "benchmark-results"
+EXAMPLES_DIR = BASE_DIR / "reaktionsbeispiele"
+
+# Standard-Prompts: Reaktion auf den Bootblock (wie in reaktionsbeispiele/) + zwei Tool-Aufgaben
+DEFAULT_PROMPTS = [
+    "Du hast den Polylog Bootblock erhalten. Wie verstehst du ihn, und was bedeutet er "
+    "für unsere Zusammenarbeit?",
+    "Lies die README.md und nenne die Dateien des Projekts mit je einem Satz.",
+    "Zeige die Verzeichnisstruktur des Projekts und sag mir, wo die Tools definiert sind.",
+]
+
+
+# =============================================================================
+# Ollama-Hilfen
+# =============================================================================
+
+def list_models(host: str) -> List[str]:
+    """Lokal installierte Modelle (/api/tags)."""
+    requests = _requests()
+    r = requests.get(f"{host}/api/tags", timeout=5)
+    r.raise_for_status()
+    return sorted(m.get("name") or m.get("model") for m in r.json().get("models", []))
+
+
+def unload_model(host: str, model: str):
+    """Entlädt ein Modell (keep_alive=0), damit die Ladezeit kalt gemessen wird."""
+    requests = _requests()
+    try:
+        requests.post(f"{host}/api/generate", json={"model": model, "keep_alive": 0}, timeout=30)
+    except Exception:
+        pass
+
+
+def load_prompts(path: Optional[Path]) -> List[str]:
+    """Prompts aus Datei (getrennt durch Zeilen mit '---') oder die Standard-Prompts."""
+    if path is None:
+        return list(DEFAULT_PROMPTS)
+
+    prompts, current = [], []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip() == "---":
+            prompts.append("\n".join(current).strip())
+            current = []
+        else:
+            current.append(line)
+    prompts.append("\n".join(current).strip())
+    return [p for p in prompts if p]
+
+
+# =============================================================================
+# Messung
+# =============================================================================
+
+def run_prompt(bridge: PolylogBridge, prompt: str) -> Dict[str, Any]:
+    """Eine Anfrage mit frischem Verlauf. Gibt Messwerte und Antwort zurück."""
+    # Client (inkl. erkanntem Endpunkt) bleibt, nur die Konversation beginnt neu
+    bridge.reset()
+    rounds: List[Dict[str, float]] = []
+    bridge.client.add_stats_listener(rounds.append)
+
+    started = time.perf_counter()
+    answer = bridge.process(prompt)
+    wall = time.perf_counter() - started
+    bridge.client.remove_stats_listener(rounds.append)
+
+    eval_tokens = sum(r["eval_tokens"] for r in rounds)
+    eval_seconds = sum(r["eval_seconds"] for r in rounds)
+    return {
+        "wall_seconds": wall,
+        "ttft_seconds": rounds[0]["ttft_seconds"] if rounds else None,
+        "tokens_per_second": eval_tokens / eval_seconds if eval_seconds else None,
+        "prompt_tokens": sum(r["prompt_tokens"] for r in rounds),
+        "eval_tokens": eval_tokens,
+        "iterations": len(rounds),
+        "tool_calls": sum(1 for m in bridge.messages if m.get("role") == "tool"),
+        "error": answer if answer.startswith("Fehler:") else None,
+        "answer": answer,
+    }
+
+
+def benchmark_model(model: str, prompts: List[str], args) -> Dict[str, Any]:
+    """Misst Ladezeit und alle Prompts für ein Modell."""
+    config = BridgeConfig(
+        model=model,
+        ollama_host=args.host,
+        timeout=args.timeout,
+        max_iterations=args.max_iterations,
+        temperature=args.temperature,
+        working_dir=BASE_DIR,
+    )
+
+    if not args.warm:
+        unload_model(args.host, model)
+    bridge = PolylogBridge(config)
+    bridge.tool_config.allow_write = False  # Benchmark verändert keine Dateien
+    started = time.perf_counter()
+    loaded = bridge.client.preload()
+    load_seconds = time.perf_counter() - started
+
+    result = {"model": model, "load_seconds": load_seconds if loaded else None, "runs": []}
+    if not loaded:
+        result["error"] = "Modell konnte nicht geladen werden"
+        return result
+
+    for run in range(args.runs):
+        for index, prompt in enumerate(prompts):
+            print(f"  [{run + 1}/{args.runs}] Prompt {index + 1}/{len(prompts)} ...", end=" ", flush=True)
+            measurement = run_prompt(bridge, prompt)
+            measurement.update(prompt_index=index, run=run)
+            result["runs"].append(measurement)
+            if measurement["error"]:
+                print(measurement["error"])
+            else:
+                tps = measurement["tokens_per_second"]
+                print(f"{measurement['wall_seconds']:.1f}s, "
+                      f"{f'{tps:.1f} tok/s' if tps else '- tok/s'}, "
+                      f"{measurement['tool_calls']} Tools")
+    return result
+
+
+def summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Mediane bzw. Mittelwerte pro Modell (nur erfolgreiche Läufe)."""
+    ok = [r for r in result["runs"] if not r["error"]]
+
+    def median(key):
+        values = [r[key] for r in ok if r[key] is not None]
+        return statistics.median(values) if values else None
+
+    def mean(key):
+        return statistics.mean(r[key] for r in ok) if ok else None
+
+    return {
+        "model": result["model"],
+        "load_seconds": result.get("load_seconds"),
+        "ttft_seconds": median("ttft_seconds"),
+        "tokens_per_second": median("tokens_per_second"),
+        "wall_seconds": median("wall_seconds"),
+        "tool_calls": mean("tool_calls"),
+        "iterations": mean("iterations"),
+        "errors": len(result["runs"]) - len(ok) + (1 if result.get("error") else 0),
+    }
+
+
+# =============================================================================
+# Berichte
+# =============================================================================
+
+def _fmt(value: Optional[float], digits: int = 2) -> str:
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def write_reports(results: List[Dict[str, Any]], prompts: List[str], args, stamp: str) -> Path:
+    """Schreibt JSON (Rohdaten) und Markdown (Vergleichstabelle)."""
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    summaries = sorted(
+        (summarize(r) for r in results),
+        key=lambda s: -(s["tokens_per_second"] or 0)
+    )
+    (out_dir / f"benchmark_{stamp}.json").write_text(json.dumps({
+        "host": args.host,
+        "timestamp": stamp,
+        "prompts": prompts,
+        "summary": summaries,
+        "results": results,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    lines = [
+        f"# Polylog Benchmark {stamp}",
+        "",
+        f"Host: `{args.host}` | Läufe: {args.runs} | Prompts: {len(prompts)} | "
+        f"Laden: {'warm' if args.warm else 'kalt'}",
+        "",
+        "| Modell | Laden (s) | TTFT (s) | Tokens/s | Antwort (s) | Tool-Aufrufe | Runden | Fehler |",
+        "|--------|-----------|----------|----------|-------------|--------------|--------|--------|",
+    ]
+    for s in summaries:
+        lines.append(
+            f"| `{s['model']}` | {_fmt(s['load_seconds'])} | {_fmt(s['ttft_seconds'])} | "
+            f"{_fmt(s['tokens_per_second'], 1)} | {_fmt(s['wall_seconds'])} | "
+            f"{_fmt(s['tool_calls'], 1)} | {_fmt(s['iterations'], 1)} | {s['errors']} |"
+        )
+    lines += ["", "Median über alle Läufe; Tool-Aufrufe und Runden als Mittelwert.", "", "## Prompts", ""]
+    lines += [f"{i}. {p}" for i, p in enumerate(prompts, 1)]
+
+    report = out_dir / f"benchmark_{stamp}.md"
+    report.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return report
+
+
+def write_example(result: Dict[str, Any], stamp: str) -> Optional[Path]:
+    """Antwort auf den ersten Prompt als neues Reaktionsbeispiel (mit Messwerten)."""
+    first = next((r for r in result["runs"] if r["prompt_index"] == 0 and not r["error"]), None)
+    if first is None:
+        return None
+
+    name = result["model"].replace(":latest", "").replace(":", "-").replace("/", "-")
+    path = EXAMPLES_DIR / f"{name}_ollama_lokal_{stamp}.md"
+    tps = first["tokens_per_second"]
+    footer = (
+        f"\n\n---\n*{result['model']} (Ollama lokal) | Laden {_fmt(result.get('load_seconds'))}s | "
+        f"TTFT {_fmt(first['ttft_seconds'])}s | {_fmt(tps, 1)} Tokens/s | "
+        f"Antwort {_fmt(first['wall_seconds'])}s*\n"
+    )
+    EXAMPLES_DIR.mkdir(exist_ok=True)
+    path.write_text(first["answer"].strip() + footer, encoding="utf-8")
+    return path
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Polylog Benchmark - Modelle im Vergleich")
+    parser.add_argument("--host", default="http://localhost:11434", help="Ollama-Host")
+    parser.add_argument("--models", nargs="*", help="Modelle (default: alle installierten)")
+    parser.add_argument("--prompts", type=Path, help="Prompt-Datei (Prompts durch '---' getrennt)")
+    parser.add_argument("--runs", type=int, default=1, help="Läufe pro Prompt")
+    parser.add_argument("--warm", action="store_true", help="Modelle vorher nicht entladen")
+    parser.add_argument("--timeout", type=int, default=300, help="Lese-Timeout pro Anfrage")
+    parser.add_argument("--max-iterations", type=int, default=5, help="Max. Tool-Runden pro Anfrage")
+    parser.add_argument("--temperature", type=float, default=0.0,
+                        help="Temperatur (default 0 für vergleichbare Antworten)")
+    parser.add_argument("--out", default=str(RESULTS_DIR), help="Ausgabeverzeichnis für Berichte")
+    parser.add_argument("--no-examples", action="store_true",
+                        help="Keine neuen Dateien in reaktionsbeispiele/ schreiben")
+    args = parser.parse_args()
+    args.host = args.host.rstrip("/")
+
+    try:
+        models = args.models or list_models(args.host)
+    except Exception as e:
+        print(f"✗ Ollama nicht erreichbar ({args.host}): {e}")
+        sys.exit(1)
+    if not models:
+        print("✗ Keine Modelle installiert (ollama pull <modell>)")
+        sys.exit(1)
+
+    prompts = load_prompts(args.prompts)
+    stamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    print(f"Benchmark: {len(models)} Modelle × {len(prompts)} Prompts × {args.runs} Läufe\n")
+
+    results = []
+    for model in models:
+        print(f"▶ {model}")
+        result = benchmark_model(model, prompts, args)
+        results.append(result)
+        if result.get("error"):
+            print(f"  ✗ {result['error']}")
+            continue
+        print(f"  Laden: {_fmt(result['load_seconds'])}s")
+        if not args.no_examples:
+            example = write_example(result, stamp)
+            if example:
+                print(f"  → {example}")
+        if not args.warm:
+            unload_model(args.host, model)  # Speicher für das nächste Modell freigeben
+
+    report = write_reports(results, prompts, args, stamp)
+    print()
+    print(report.read_text(encoding="utf-8"))
+    print(f"Bericht: {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,32 +9,101 @@ Usage:
     python polylog_bridge.py                         # Interaktiv mit devstral-small-2:latest
     python polylog_bridge.py --model qwen2.5:3b      # Mit anderem Modell
     python polylog_bridge.py --test                  # Test-Modus (ohne Ollama)
+    python polylog_bridge.py --bench-startup         # Import-/Startzeit gegen Budget prüfen
+    python polylog_bridge.py --allow-commands        # run_command-Tool freigeben
+    python polylog_bridge.py --autotune              # Ollama-Optionen für diese Maschine einmessen
+    python polylog_bridge.py --temperature 0 --response-cache .polylog-cache "..."  # CI-Läufe cachen
 
 Autor: Jan-Christoph Thieme (mit Vibe Coding)
 Datum: 13.01.2026
 """
 
+import contextvars
+import importlib.util
 import json
-import platform
+import os
 import sys
-import inspect
+import threading
+import time
+import zlib
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Callable, get_type_hints
+from typing import Optional, Dict, Any, List, Callable
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from functools import wraps
 
-# Platform
-IS_WINDOWS = platform.system() == "Windows"
+# Platform (os.name statt platform.system() - platform kostet Importzeit)
+IS_WINDOWS = os.name == "nt"
 
-# Requests
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
+# Requests - wird erst beim ersten HTTP-Aufruf importiert (spart >50ms Startzeit)
+REQUESTS_AVAILABLE = importlib.util.find_spec("requests") is not None
+if not REQUESTS_AVAILABLE:
     print("Warning: pip install requests")
 
 
+def _requests():
+    """Importiert requests beim ersten Gebrauch."""
+    import requests
+    return requests
+
+
+# =============================================================================
+# Metriken
+# =============================================================================
+
+class BridgeMetrics:
+    """Zähler und Messwerte einer Bridge-Session (thread-safe)."""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = {}
+        # name -> [anzahl, summe, maximum]
+        self._observations: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1):
+        """Erhöht einen Zähler."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """Erfasst einen Messwert (z.B. Dauer in Sekunden)."""
+        with self._lock:
+            entry = self._observations.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += value
+            entry[2] = max(entry[2], value)
+
+    def get(self, name: str) -> float:
+        """Aktueller Zählerstand (0 wenn unbekannt)."""
+        return self._counters.get(name, 0)
+
+    def ratio(self, hits: str, misses: str) -> Optional[float]:
+        """Trefferquote hits / (hits + misses), None ohne Daten."""
+        total = self.get(hits) + self.get(misses)
+        return self.get(hits) / total if total else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Kopie aller Zähler und Messwerte."""
+        with self._lock:
+            observations = {
+                name: {"count": n, "total": total, "avg": total / n if n else 0.0, "max": peak}
+                for name, (n, total, peak) in self._observations.items()
+            }
+            return {"counters": dict(self._counters), "observations": observations}
+
+    def format(self) -> str:
+        """Lesbare Übersicht für /stats."""
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"  {name:<36} {value:g}")
+        for name, o in sorted(snap["observations"].items()):
+            lines.append(
+                f"  {name:<36} n={o['count']:g} avg={o['avg']:.3f} max={o['max']:.3f}"
+            )
+        return "\n".join(lines) if lines else "  (noch keine Daten)"
+
+
 # =============================================================================
 # Tool Registry - Dekorator-basierte Tool-Definitionen
 # =============================================================================
@@ -44,104 +113,304 @@ class ToolRegistry:
 
     _tools: Dict[str, Dict[str, Any]] = {}
 
+    # Vorberechnete Schemas - erspart inspect/get_type_hints beim Start
+    SCHEMA_CACHE = Path(__file__).parent / "__pycache__" / "polylog_tool_schemas.json"
+    # Erhöhen, wenn sich _build_schema ändert - sonst liefert der Cache alte Schemas
+    SCHEMA_BUILDER_VERSION = 2
+    _schema_lock = threading.Lock()
+
+    # Tool-Gruppen, deren Schemas nur bei Bedarf gesendet werden: Wortanfänge in den
+    # Anfragen der Session (ohne Groß-/Kleinschreibung). Gruppen ohne Eintrag immer.
+    GROUP_KEYWORDS: Dict[str, tuple] = {
+        "web": ("recherch", "web", "internet", "wikipedia", "nachschlag", "google", "search"),
+        "befehle": ("test", "unittest", "pytest", "ausführ", "starte", "befehl", "lint", "build",
+                    "kompil", "compil", "make", "npm", "pip", "install", "command", "run", "shell"),
+    }
+    _group_patterns: Dict[str, Any] = {}
+
     @classmethod
-    def tool(cls, description: str):
+    def tool(cls, description: str, mutating: bool = False, group: str = "dateien"):
         """
         Dekorator um eine Funktion als Tool zu registrieren.
 
+        Das Schema wird erst bei Bedarf erzeugt (siehe get_schemas).
+        mutating=True markiert Tools mit Seiteneffekten (z.B. write_file).
+        group ordnet das Tool einer Gruppe zu (siehe select_schemas).
+
         @ToolRegistry.tool("Liest den Inhalt einer Datei")
         def read_file(path: str) -> dict:
             ...
         """
         def decorator(func: Callable) -> Callable:
-            # Schema aus Type Hints generieren
-            hints = get_type_hints(func)
-            sig = inspect.signature(func)
+            # Tool registrieren
+            cls._tools[func.__name__] = {
+                "function": func,
+                "description": description,
+                "mutating": mutating,
+                "group": group,
+                "schema": None
+            }
 
-            properties = {}
-            required = []
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return func(*args, **kwargs)
+            return wrapper
 
-            for param_name, param in sig.parameters.items():
-                if param_name == 'self':
-                    continue
+        return decorator
 
-                param_type = hints.get(param_name, str)
+    @staticmethod
+    def _build_schema(func: Callable, description: str) -> Dict[str, Any]:
+        """Generiert das JSON-Schema aus Type Hints und Docstring."""
+        import inspect
+        from typing import Union, get_args, get_origin, get_type_hints
 
-                # Python Type → JSON Schema Type
-                type_map = {
-                    str: "string",
-                    int: "integer",
-                    float: "number",
-                    bool: "boolean",
-                    list: "array",
-                    dict: "object"
-                }
+        hints = get_type_hints(func)
+        sig = inspect.signature(func)
 
-                json_type = type_map.get(param_type, "string")
+        properties = {}
+        required = []
 
-                # Parameter-Beschreibung aus Docstring extrahieren
-                param_desc = f"Parameter: {param_name}"
-                if func.__doc__:
-                    for line in func.__doc__.split('\n'):
-                        if param_name in line and ':' in line:
-                            param_desc = line.split(':', 1)[-1].strip()
-                            break
+        for param_name, param in sig.parameters.items():
+            if param_name == 'self':
+                continue
+
+            param_type = hints.get(param_name, str)
+
+            # Optional[X] → X
+            if get_origin(param_type) is Union:
+                non_none = [a for a in get_args(param_type) if a is not type(None)]
+                param_type = non_none[0] if len(non_none) == 1 else str
+
+            # Python Type → JSON Schema Type
+            type_map = {
+                str: "string",
+                int: "integer",
+                float: "number",
+                bool: "boolean",
+                list: "array",
+                dict: "object"
+            }
+
+            json_type = type_map.get(get_origin(param_type) or param_type, "string")
+
+            # Parameter-Beschreibung aus Docstring extrahieren
+            param_desc = f"Parameter: {param_name}"
+            if func.__doc__:
+                for line in func.__doc__.split('\n'):
+                    if param_name in line and ':' in line:
+                        param_desc = line.split(':', 1)[-1].strip()
+                        break
+
+            properties[param_name] = {
+                "type": json_type,
+                "description": param_desc
+            }
 
-                properties[param_name] = {
-                    "type": json_type,
-                    "description": param_desc
+            # List[str] → items
+            if json_type == "array" and get_args(param_type):
+                properties[param_name]["items"] = {
+                    "type": type_map.get(get_args(param_type)[0], "string")
                 }
 
-                # Required wenn kein Default
-                if param.default == inspect.Parameter.empty:
-                    required.append(param_name)
+            # Required wenn kein Default
+            if param.default == inspect.Parameter.empty:
+                required.append(param_name)
 
-            # Tool registrieren
-            cls._tools[func.__name__] = {
-                "function": func,
-                "schema": {
-                    "type": "function",
-                    "function": {
-                        "name": func.__name__,
-                        "description": description,
-                        "parameters": {
-                            "type": "object",
-                            "properties": properties,
-                            "required": required
-                        }
-                    }
+        return {
+            "type": "function",
+            "function": {
+                "name": func.__name__,
+                "description": description,
+                "parameters": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": required
                 }
             }
+        }
 
-            @wraps(func)
-            def wrapper(*args, **kwargs):
-                return func(*args, **kwargs)
-            return wrapper
+    @staticmethod
+    def _schema_key(func: Callable, description: str) -> str:
+        """Cache-Schlüssel: ändert sich mit Signatur, Annotationen, Docstring oder Builder-Version."""
+        code = func.__code__
+        raw = repr((
+            ToolRegistry.SCHEMA_BUILDER_VERSION,
+            func.__name__,
+            description,
+            func.__doc__,
+            code.co_varnames[:code.co_argcount + code.co_kwonlyargcount],
+            func.__defaults__,
+            sorted((k, repr(v)) for k, v in func.__annotations__.items())
+        ))
+        return f"{func.__name__}:{zlib.crc32(raw.encode('utf-8')):08x}"
 
-        return decorator
+    @classmethod
+    def _ensure_schemas(cls):
+        """Füllt fehlende Schemas aus dem Cache oder generiert sie."""
+        if all(t["schema"] is not None for t in cls._tools.values()):
+            return
+
+        with cls._schema_lock:
+            cls._fill_schemas()
+
+    @classmethod
+    def _fill_schemas(cls):
+        missing = [t for t in cls._tools.values() if t["schema"] is None]
+        if not missing:
+            return
+
+        try:
+            cached = json.loads(cls.SCHEMA_CACHE.read_text(encoding="utf-8"))
+        except Exception:
+            cached = {}
+
+        changed = False
+        for t in missing:
+            key = cls._schema_key(t["function"], t["description"])
+            if key not in cached:
+                cached[key] = cls._build_schema(t["function"], t["description"])
+                changed = True
+            t["schema"] = cached[key]
+
+        if changed:
+            cls._write_schema_cache(cached)
+
+    @classmethod
+    def _write_schema_cache(cls, cached: Dict[str, Any]):
+        """Schreibt den Schema-Cache (nur aktuelle Tools, atomar)."""
+        current = {
+            cls._schema_key(t["function"], t["description"]) for t in cls._tools.values()
+        }
+        try:
+            cls.SCHEMA_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cls.SCHEMA_CACHE.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(
+                json.dumps({k: v for k, v in cached.items() if k in current}, ensure_ascii=False),
+                encoding="utf-8"
+            )
+            os.replace(tmp, cls.SCHEMA_CACHE)
+        except OSError:
+            pass  # Cache ist optional (z.B. schreibgeschütztes Verzeichnis)
+
+    @classmethod
+    def get_schemas(cls, exclude_groups: tuple = ()) -> List[Dict]:
+        """Gibt alle Tool-Schemas für Ollama zurück (ohne die Gruppen in exclude_groups)."""
+        cls._ensure_schemas()
+        return [t["schema"] for t in cls._tools.values() if t["group"] not in exclude_groups]
+
+    @classmethod
+    def select_schemas(cls, messages: List[Dict], exclude_groups: tuple = ()) -> List[Dict]:
+        """
+        Schemas der für diesen Verlauf relevanten Tools.
+
+        Eine Gruppe aus GROUP_KEYWORDS wird aktiv, sobald eine Anfrage der Session
+        eines ihrer Stichwörter enthält oder eines ihrer Tools aufgerufen wurde.
+        Die Auswahl wächst nur mit dem Verlauf - der Prompt-Anfang bleibt stabil.
+        """
+        import re
+
+        cls._ensure_schemas()
+        text = " ".join(m.get("content") or "" for m in messages if m.get("role") == "user")
+        active = set()
+        for group, words in cls.GROUP_KEYWORDS.items():
+            pattern = cls._group_patterns.get(group)
+            if pattern is None or pattern[0] != words:
+                pattern = cls._group_patterns[group] = (
+                    words, re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + ")", re.IGNORECASE)
+                )
+            if pattern[1].search(text):
+                active.add(group)
+        for msg in messages:
+            for call in msg.get("tool_calls") or []:
+                tool = cls._tools.get(call.get("function", {}).get("name"))
+                if tool:
+                    active.add(tool["group"])
+        return [
+            t["schema"] for t in cls._tools.values()
+            if t["group"] not in exclude_groups
+            and (t["group"] not in cls.GROUP_KEYWORDS or t["group"] in active)
+        ]
 
     @classmethod
-    def get_schemas(cls) -> List[Dict]:
-        """Gibt alle Tool-Schemas für Ollama zurück."""
-        return [t["schema"] for t in cls._tools.values()]
+    def get_description(cls, name: str) -> str:
+        """Kurzbeschreibung eines Tools (ohne Schema-Generierung)."""
+        return cls._tools[name]["description"]
 
     @classmethod
-    def execute(cls, name: str, args: Dict[str, Any]) -> Dict[str, Any]:
-        """Führt ein Tool aus."""
+    def execute(cls, name: str, args: Dict[str, Any],
+                config: Optional["ToolConfig"] = None) -> Dict[str, Any]:
+        """
+        Führt ein Tool aus.
+
+        config: Tool-Kontext für diesen Aufruf (Default: aktiver bzw. globaler Kontext)
+        """
         if name not in cls._tools:
             return {"success": False, "error": f"Unknown tool: {name}"}
 
         try:
             func = cls._tools[name]["function"]
-            result = func(**args)
-            return result
+            if config is None:
+                return func(**args)
+            with use_config(config):
+                return func(**args)
         except Exception as e:
             return {"success": False, "error": str(e)}
 
     @classmethod
-    def list_tools(cls) -> List[str]:
-        """Listet alle registrierten Tools."""
-        return list(cls._tools.keys())
+    def check_arguments(cls, name: str, args: Any) -> tuple:
+        """
+        Prüft einen Aufruf gegen das Schema des Tools.
+
+        Zahlen und Wahrheitswerte, die als String kommen ("2", "true"), werden
+        umgewandelt. Returns: (args, None) oder (args, Fehlermeldung)
+        """
+        if name not in cls._tools:
+            return args, f"Unknown tool: {name}"
+        if not isinstance(args, dict):
+            return args, "arguments muss ein Objekt sein"
+
+        cls._ensure_schemas()
+        params = cls._tools[name]["schema"]["function"]["parameters"]
+        properties = params["properties"]
+
+        missing = [p for p in params["required"] if p not in args]
+        if missing:
+            return args, f"Fehlende Argumente: {', '.join(missing)}"
+        unknown = [k for k in args if k not in properties]
+        if unknown:
+            return args, f"Unbekannte Argumente: {', '.join(unknown)}"
+
+        checked = {}
+        for key, value in args.items():
+            expected = properties[key]["type"]
+            if isinstance(value, str) and expected in ("integer", "number", "boolean"):
+                try:
+                    value = {"integer": int, "number": float}[expected](value) if expected != "boolean" \
+                        else {"true": True, "false": False}[value.strip().lower()]
+                except (ValueError, KeyError):
+                    return args, f"{key}: {expected} erwartet"
+            valid = {
+                "string": lambda v: isinstance(v, str),
+                "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+                "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+                "boolean": lambda v: isinstance(v, bool),
+                "array": lambda v: isinstance(v, list),
+                "object": lambda v: isinstance(v, dict),
+            }.get(expected, lambda v: True)
+            if value is not None and not valid(value):
+                return args, f"{key}: {expected} erwartet"
+            checked[key] = value
+        return checked, None
+
+    @classmethod
+    def is_mutating(cls, name: str) -> bool:
+        """True wenn das Tool Seiteneffekte hat."""
+        return name in cls._tools and cls._tools[name]["mutating"]
+
+    @classmethod
+    def list_tools(cls, exclude_groups: tuple = ()) -> List[str]:
+        """Listet alle registrierten Tools (ohne die Gruppen in exclude_groups)."""
+        return [name for name, t in cls._tools.items() if t["group"] not in exclude_groups]
 
 
 # =============================================================================
@@ -150,32 +419,66 @@ class ToolRegistry:
 
 @dataclass
 class ToolConfig:
-    """Konfiguration für Tools."""
+    """
+    Konfiguration bzw. Kontext für Tools.
+
+    Jede PolylogBridge hat ihren eigenen ToolConfig und übergibt ihn pro
+    Tool-Aufruf (ToolRegistry.execute(..., config=...)). Tools lesen ihn
+    über get_config() - so laufen mehrere Sessions isoliert in einem Prozess.
+    """
     working_dir: Path = field(default_factory=lambda: Path(".").resolve())
     allow_write: bool = True
+    read_cache: Optional["ReadCache"] = None  # Session-Cache für read_file/read_files
+    allow_commands: bool = False  # run_command nur nach ausdrücklicher Freigabe
+    watcher: Optional["FileWatcher"] = None  # hält Caches ohne stat() aktuell
+    snapshots: Optional["SnapshotStore"] = None  # Rollback-Journal für write_file
+    # (Pfad, Inhalt vorher als Bytes oder None) des letzten write_file - einmal gelesen,
+    # für Snapshot und den Diff im Verlauf
+    last_write: Optional[tuple] = None
 
 
-# Globale Config (wird von Tools verwendet)
+# Globale Default-Config (für direkte Tool-Aufrufe ohne Bridge)
 _config = ToolConfig()
 
+# Kontext des laufenden Tool-Aufrufs (pro Thread / asyncio-Task)
+_active_config: contextvars.ContextVar[Optional[ToolConfig]] = contextvars.ContextVar(
+    "polylog_tool_config", default=None
+)
+
 
 def set_config(config: ToolConfig):
-    """Setzt die globale Tool-Konfiguration."""
+    """Setzt die globale Default-Konfiguration (gilt nur ohne aktiven Kontext)."""
     global _config
     _config = config
 
 
-def _safe_path(path_str: str) -> Optional[Path]:
+def get_config() -> ToolConfig:
+    """Aktive Tool-Konfiguration: die des laufenden Aufrufs, sonst die globale."""
+    return _active_config.get() or _config
+
+
+@contextmanager
+def use_config(config: ToolConfig):
+    """Aktiviert einen Tool-Kontext für den aktuellen Thread bzw. Task."""
+    token = _active_config.set(config)
+    try:
+        yield config
+    finally:
+        _active_config.reset(token)
+
+
+def _safe_path(path_str: str, config: Optional[ToolConfig] = None) -> Optional[Path]:
     """Validiert Pfad - muss im Working Directory sein."""
+    config = config or get_config()
     try:
         path = Path(path_str)
         if not path.is_absolute():
-            path = _config.working_dir / path
+            path = config.working_dir / path
         path = path.resolve()
 
         # Sicherheitscheck
         try:
-            path.relative_to(_config.working_dir)
+            path.relative_to(config.working_dir)
             return path
         except ValueError:
             return None
@@ -183,10 +486,464 @@ def _safe_path(path_str: str) -> Optional[Path]:
         return None
 
 
+# =============================================================================
+# Dateiinhalte - Formaterkennung und kompakte Extraktoren
+# =============================================================================
+
+SNIFF_BYTES = 8192
+# Obergrenze für Formate, die vollständig geparst werden müssen (JSON, ipynb)
+PARSE_LIMIT_BYTES = 20 * 1024 * 1024
+CSV_SAMPLE_ROWS = 5
+CSV_TYPE_ROWS = 200
+CSV_COUNT_LIMIT = 2_000_000
+
+# Magic Bytes → Format
+_MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"\x89PNG", "PNG-Bild"),
+    (b"\xff\xd8\xff", "JPEG-Bild"),
+    (b"GIF8", "GIF-Bild"),
+    (b"%PDF", "PDF"),
+    (b"PK\x03\x04", "ZIP-Archiv"),
+    (b"\x7fELF", "ELF-Binary"),
+    (b"SQLite format 3\x00", "SQLite-Datenbank"),
+]
+COMPRESSED_FORMATS = {"gzip", "bzip2", "xz", "zstd"}
+_COMPRESSED_SUFFIXES = {".gz": "gzip", ".bz2": "bzip2", ".xz": "xz", ".zst": "zstd"}
+
+
+def _sniff_format(path: Path, head: bytes) -> str:
+    """Erkennt Kompression bzw. bekannte Binärformate am ersten Block."""
+    for magic, name in _MAGIC:
+        if head.startswith(magic):
+            return name
+    if head[:3] == b"BZh" and head[3:4].isdigit():
+        return "bzip2"
+    return _COMPRESSED_SUFFIXES.get(path.suffix.lower(), "text")
+
+
+def _is_binary(head: bytes) -> bool:
+    """Heuristik: NUL-Bytes oder viele Steuerzeichen → binär."""
+    if not head:
+        return False
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return False  # UTF-16 mit BOM
+    if b"\x00" in head:
+        return True
+    control = sum(1 for b in head if b < 32 and b not in (8, 9, 10, 12, 13, 27))
+    return control / len(head) > 0.3
+
+
+def _guess_encoding(head: bytes) -> str:
+    """UTF-8/UTF-16 wenn möglich, sonst cp1252 (typisch für ältere Windows-Dateien)."""
+    import codecs
+
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def _open_decompressed(path: Path, codec: str):
+    """Öffnet einen komprimierten Stream (binär, gepuffert, gestreamt)."""
+    import io
+
+    if codec == "gzip":
+        import gzip
+        return io.BufferedReader(gzip.open(path, "rb"))
+    if codec == "bzip2":
+        import bz2
+        return io.BufferedReader(bz2.open(path, "rb"))
+    if codec == "xz":
+        import lzma
+        return io.BufferedReader(lzma.open(path, "rb"))
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(".zst benötigt: pip install zstandard")
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        )
+    raise ValueError(f"Unbekannte Kompression: {codec}")
+
+
+def _truncate(content: str, max_chars: int) -> tuple:
+    """Kürzt auf max_chars. Gibt (content, truncated) zurück."""
+    if len(content) > max_chars:
+        return content[:max_chars] + "\n... [truncated]", True
+    return content, False
+
+
+def _text_stream(stream, encoding: str):
+    """Text-Sicht auf einen Binär-Stream (CSV braucht newline='')."""
+    import io
+
+    return io.TextIOWrapper(stream, encoding=encoding, errors="ignore", newline="")
+
+
+def _summarize_csv(stream, name: str, max_chars: int) -> str:
+    """CSV/TSV: Spalten mit erkannten Typen, Zeilenzahl und Beispielzeilen."""
+    import csv
+    import io
+    import itertools
+
+    sample = stream.read(SNIFF_BYTES)
+    # Angefangene letzte Zeile mitnehmen, damit der Sniffer ganze Zeilen sieht
+    sample += stream.readline()
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel_tab if name.endswith(".tsv") else csv.excel
+
+    reader = csv.reader(itertools.chain(io.StringIO(sample), stream), dialect)
+    header = next(reader, [])
+    types: List[set] = [set() for _ in header]
+    rows: List[List[str]] = []
+    count = 0
+
+    def kind(value: str) -> str:
+        if value == "":
+            return "leer"
+        for cast, label in ((int, "int"), (float, "float")):
+            try:
+                cast(value)
+                return label
+            except ValueError:
+                pass
+        return "bool" if value.lower() in ("true", "false") else "str"
+
+    for row in reader:
+        count += 1
+        if count <= CSV_SAMPLE_ROWS:
+            rows.append(row)
+        if count <= CSV_TYPE_ROWS:
+            for i, value in enumerate(row[:len(types)]):
+                types[i].add(kind(value))
+        if count >= CSV_COUNT_LIMIT:
+            break
+
+    def column_type(found: set) -> str:
+        found = found - {"leer"}
+        if not found:
+            return "leer"
+        if found <= {"int"}:
+            return "int"
+        if found <= {"int", "float"}:
+            return "float"
+        return "bool" if found == {"bool"} else "str"
+
+    lines = [
+        f"CSV: {'≥' if count >= CSV_COUNT_LIMIT else ''}{count} Zeilen, {len(header)} Spalten "
+        f"(Trennzeichen {dialect.delimiter!r})",
+        "Spalten:"
+    ]
+    lines += [f"  - {col} ({column_type(types[i])})" for i, col in enumerate(header)]
+    lines.append("Beispielzeilen:")
+    out = io.StringIO()
+    writer = csv.writer(out, dialect, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    lines.append(out.getvalue().rstrip())
+    return _truncate("\n".join(lines), max_chars)[0]
+
+
+def _describe_json(value: Any, indent: int = 0, depth: int = 4, max_keys: int = 25) -> List[str]:
+    """Strukturübersicht: Schlüssel, Typen, Listenlängen, Beispielwerte."""
+    pad = "  " * indent
+
+    if isinstance(value, dict):
+        if depth == 0:
+            return [f"{pad}{{... {len(value)} Schlüssel}}"]
+        lines = [f"{pad}{{"]
+        for i, (key, item) in enumerate(value.items()):
+            if i >= max_keys:
+                lines.append(f"{pad}  ... +{len(value) - max_keys} weitere Schlüssel")
+                break
+            sub = _describe_json(item, indent + 1, depth - 1, max_keys)
+            lines.append(f"{pad}  {json.dumps(key, ensure_ascii=False)}: {sub[0].strip()}")
+            lines.extend(sub[1:])
+        lines.append(f"{pad}}}")
+        return lines
+
+    if isinstance(value, list):
+        if not value:
+            return [f"{pad}[]"]
+        if depth == 0:
+            return [f"{pad}list[{len(value)}] von {type(value[0]).__name__}"]
+        sub = _describe_json(value[0], indent, depth - 1, max_keys)
+        return [f"{pad}list[{len(value)}] von {sub[0].strip()}"] + sub[1:]
+
+    if isinstance(value, str):
+        example = value if len(value) <= 40 else value[:40] + "…"
+        return [f"{pad}str ({json.dumps(example, ensure_ascii=False)})"]
+    if value is None:
+        return [f"{pad}null"]
+    return [f"{pad}{type(value).__name__} ({value!r})"]
+
+
+def _summarize_notebook(data: Dict[str, Any], max_chars: int) -> str:
+    """Jupyter-Notebook: Zellquellen plus gekürzte Textausgaben, ohne Bilddaten."""
+    parts = []
+    for i, cell in enumerate(data.get("cells", []), 1):
+        source = "".join(cell.get("source", [])).rstrip()
+        label = cell.get("cell_type", "code")
+        if cell.get("execution_count"):
+            label += f", In [{cell['execution_count']}]"
+        parts.append(f"# %% [{label}] Zelle {i}\n{source}")
+
+        for output in cell.get("outputs", []):
+            kind = output.get("output_type")
+            if kind == "stream":
+                text = "".join(output.get("text", []))
+            elif kind == "error":
+                text = f"{output.get('ename')}: {output.get('evalue')}"
+            else:
+                bundle = output.get("data", {})
+                text = "".join(bundle.get("text/plain", []))
+                media = [m for m in bundle if m != "text/plain"]
+                if media:
+                    text += f" [Ausgabe: {', '.join(media)}]"
+            text = text.rstrip()
+            if text:
+                parts.append("# Ausgabe:\n" + text[:500] + ("…" if len(text) > 500 else ""))
+
+    return _truncate("\n\n".join(parts), max_chars)[0]
+
+
+def _read_content(path: Path, max_chars: int) -> Dict[str, Any]:
+    """
+    Liest eine Datei formatbewusst.
+
+    Binärdateien werden am ersten Block erkannt und nicht dekodiert.
+    .gz/.bz2/.xz/.zst werden gestreamt entpackt (nur bis max_chars).
+    .ipynb, CSV/TSV und große JSON-Dateien werden kompakt zusammengefasst.
+
+    Returns:
+        dict mit content, truncated, format
+    """
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+
+    fmt = _sniff_format(path, head)
+    size = path.stat().st_size
+    name = path.name.lower()
+
+    if fmt in COMPRESSED_FORMATS:
+        inner = name.rsplit(".", 1)[0]
+        with _open_decompressed(path, fmt) as stream:
+            inner_head = stream.peek(SNIFF_BYTES)[:SNIFF_BYTES]
+            if _is_binary(inner_head):
+                return {
+                    "content": f"[{fmt}-komprimierte Binärdaten, {size} Bytes - Inhalt nicht angezeigt]",
+                    "truncated": False, "format": f"{fmt}+binary"
+                }
+            text = _text_stream(stream, _guess_encoding(inner_head))
+            if inner.endswith((".csv", ".tsv")):
+                return {"content": _summarize_csv(text, inner, max_chars),
+                        "truncated": False, "format": f"{fmt}+csv"}
+            content, truncated = _truncate(text.read(max_chars + 1), max_chars)
+            return {"content": content, "truncated": truncated, "format": fmt}
+
+    if fmt != "text" or _is_binary(head):
+        label = fmt if fmt != "text" else "Binärdatei"
+        return {
+            "content": f"[{label}, {size} Bytes - Inhalt nicht angezeigt]",
+            "truncated": False, "format": "binary"
+        }
+
+    encoding = _guess_encoding(head)
+
+    if name.endswith((".csv", ".tsv")):
+        with open(path, encoding=encoding, errors="ignore", newline="") as f:
+            return {"content": _summarize_csv(f, name, max_chars), "truncated": False, "format": "csv"}
+
+    if name.endswith(".ipynb") and size <= PARSE_LIMIT_BYTES:
+        try:
+            data = json.loads(path.read_text(encoding=encoding, errors="ignore"))
+            return {"content": _summarize_notebook(data, max_chars), "truncated": False, "format": "ipynb"}
+        except ValueError:
+            pass  # kaputtes Notebook → als Text
+
+    # Kleine JSON-Dateien unverändert (bereits kompakt), große als Strukturübersicht
+    if name.endswith(".json") and max_chars < size <= PARSE_LIMIT_BYTES:
+        try:
+            data = json.loads(path.read_text(encoding=encoding, errors="ignore"))
+            summary = f"JSON-Struktur ({size} Bytes):\n" + "\n".join(_describe_json(data))
+            return {"content": _truncate(summary, max_chars)[0], "truncated": True, "format": "json-summary"}
+        except ValueError:
+            pass
+
+    with open(path, encoding=encoding, errors="ignore") as f:
+        content, truncated = _truncate(f.read(max_chars + 1), max_chars)
+    return {"content": content, "truncated": truncated, "format": "text"}
+
+
+class ReadCache:
+    """
+    Cache für _read_content-Ergebnisse einer Session, mit Prefetch.
+
+    Ein Eintrag gilt solange mtime und Größe der Datei unverändert sind.
+    Läuft für eine Datei gerade ein Prefetch, wartet ein Lesezugriff auf
+    dessen Ergebnis statt die Datei ein zweites Mal zu lesen.
+    """
+
+    MAX_ENTRIES = 64
+
+    def __init__(self, metrics: Optional[BridgeMetrics] = None):
+        from collections import OrderedDict
+
+        self.metrics = metrics or BridgeMetrics()
+        # Pfad -> (mtime_ns, size, max_chars, Ergebnis, vorgeladen)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._pending: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.watcher: Optional["FileWatcher"] = None
+        self._generation = 0  # zählt Watcher-Bündel (verhindert veraltete Einträge)
+
+    def attach(self, watcher: "FileWatcher"):
+        """Invalidierung über den Watcher - gültige Einträge dann ohne stat()."""
+        self.watcher = watcher
+        watcher.subscribe(self.on_change)
+
+    def on_change(self, paths: Optional[set]):
+        """FileWatcher-Abonnent: geänderte Dateien (bzw. Verzeichnisse) verwerfen."""
+        with self._lock:
+            self._generation += 1
+            if paths is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = {str(p) for p in paths}
+                prefixes = tuple(k + os.sep for k in keys)
+                stale = [k for k in self._entries if k in keys or k.startswith(prefixes)]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+        if dropped:
+            self.metrics.incr("watch.invalidations", dropped)
+
+    def read(self, path: Path, max_chars: int) -> Dict[str, Any]:
+        """Wie _read_content, aber aus dem Cache wenn möglich."""
+        key = str(path)
+        trusted = self.watcher is not None and self.watcher.watches(path.parent)
+        if trusted:
+            self.watcher.flush()  # bereits eingetroffene Änderungen zuerst anwenden
+        with self._lock:
+            pending = self._pending.get(key)
+            cached = self._entries.get(key)
+        if pending is not None:
+            pending.wait(timeout=5.0)
+            with self._lock:
+                cached = self._entries.get(key)
+
+        if cached and trusted:
+            stamp = cached[:2]  # Watcher hätte den Eintrag bei Änderung verworfen
+        else:
+            stat = path.stat()
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[:2] == stamp:
+                _, _, limit, result, prefetched = cached
+                if limit == max_chars or (not result["truncated"] and len(result["content"]) <= max_chars):
+                    self._entries.move_to_end(key)
+                    if prefetched:
+                        # Nur der erste Treffer zählt als Prefetch-Treffer
+                        self._entries[key] = cached[:4] + (False,)
+                        self.metrics.incr("prefetch.hits")
+                    else:
+                        self.metrics.incr("read_cache.hits")
+                    return result
+
+        self.metrics.incr("read_cache.misses")
+        return self._load(path, max_chars, prefetched=False)
+
+    def _load(self, path: Path, max_chars: int, prefetched: bool) -> Dict[str, Any]:
+        generation = self._generation
+        stat = path.stat()
+        result = _read_content(path, max_chars)
+        with self._lock:
+            if generation != self._generation and self.watcher is not None:
+                return result  # während des Lesens geändert - nicht cachen
+            self._entries[str(path)] = (stat.st_mtime_ns, stat.st_size, max_chars, result, prefetched)
+            self._entries.move_to_end(str(path))
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return result
+
+    def prefetch(self, paths: List[Path], max_chars: int) -> Optional[threading.Thread]:
+        """Liest die Dateien im Hintergrund in den Cache."""
+        with self._lock:
+            todo = [p for p in paths if str(p) not in self._entries and str(p) not in self._pending]
+            for p in todo:
+                self._pending[str(p)] = threading.Event()
+        if not todo:
+            return None
+
+        def run():
+            for p in todo:
+                try:
+                    self._load(p, max_chars, prefetched=True)
+                    self.metrics.incr("prefetch.files")
+                except Exception:
+                    pass  # Fehler meldet später der eigentliche Tool-Aufruf
+                finally:
+                    with self._lock:
+                        self._pending.pop(str(p)).set()
+
+        thread = threading.Thread(target=run, name="polylog-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    def invalidate(self, path: Optional[Path] = None):
+        """Verwirft einen Eintrag oder den ganzen Cache."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(path), None)
+
+
+def _read_cached(path: Path, max_chars: int, config: ToolConfig) -> Dict[str, Any]:
+    """_read_content über den Read-Cache der Session (falls vorhanden)."""
+    if config.read_cache is None:
+        return _read_content(path, max_chars)
+    return config.read_cache.read(path, max_chars)
+
+
+def find_referenced_paths(text: str, config: ToolConfig, limit: int = 8) -> List[Path]:
+    """
+    Dateipfade im Text, die im Working Directory existieren
+    (z.B. "schau dir src/app.py an" → [<wd>/src/app.py]).
+    """
+    import re
+
+    found: List[Path] = []
+    for token in re.findall(r"[\w.~/\\-]*[\w-]\.[A-Za-z0-9]{1,10}\b|[\w.-]+/[\w./-]+", text):
+        path = _safe_path(token.rstrip(".,;:"), config)
+        if path and path not in found and path.is_file():
+            found.append(path)
+            if len(found) >= limit:
+                break
+    return found
+
+
 # =============================================================================
 # Tools: read_file, write_file, webrecherche
 # =============================================================================
 
+# Limit für LLM Context (Zeichen pro Datei)
+READ_LIMIT_CHARS = 10000
+
+
 @ToolRegistry.tool("Liest den Inhalt einer Datei")
 def read_file(path: str) -> dict:
     """
@@ -205,22 +962,20 @@ def read_file(path: str) -> dict:
         return {"success": False, "error": f"Kein File: {path}"}
 
     try:
-        content = safe_path.read_text(encoding='utf-8', errors='ignore')
-        # Limit für LLM Context
-        if len(content) > 10000:
-            content = content[:10000] + "\n... [truncated]"
+        result = _read_cached(safe_path, READ_LIMIT_CHARS, get_config())
 
         return {
             "success": True,
             "path": path,
-            "content": content,
+            "content": result["content"],
+            "format": result["format"],
             "size": safe_path.stat().st_size
         }
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-@ToolRegistry.tool("Schreibt Inhalt in eine Datei")
+@ToolRegistry.tool("Schreibt Inhalt in eine Datei", mutating=True)
 def write_file(path: str, content: str) -> dict:
     """
     Schreibt eine Datei.
@@ -228,16 +983,29 @@ def write_file(path: str, content: str) -> dict:
     path: Pfad zur Datei
     content: Inhalt der Datei
     """
-    if not _config.allow_write:
+    config = get_config()
+    if not config.allow_write:
         return {"success": False, "error": "write_file deaktiviert"}
 
-    safe_path = _safe_path(path)
+    safe_path = _safe_path(path, config)
     if not safe_path:
         return {"success": False, "error": f"Ungültiger Pfad: {path}"}
 
     try:
+        # Wie write_text: "\n" wird zum Zeilenende der Plattform
+        data = (content if os.linesep == "\n" else content.replace("\n", os.linesep)).encode('utf-8')
+        previous = safe_path.read_bytes() if safe_path.is_file() else None
+
         safe_path.parent.mkdir(parents=True, exist_ok=True)
-        safe_path.write_text(content, encoding='utf-8')
+        safe_path.write_bytes(data)
+        config.last_write = (safe_path, previous)
+        _after_write(safe_path, config)
+
+        if config.snapshots is not None:
+            try:
+                config.snapshots.record(safe_path, previous, data)
+            except OSError:
+                pass  # Rollback-Journal ist optional - Schreiben hat geklappt
         return {
             "success": True,
             "path": path,
@@ -247,7 +1015,15 @@ def write_file(path: str, content: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-@ToolRegistry.tool("Führt eine Web-Recherche durch")
+def _after_write(path: Path, config: ToolConfig):
+    """Caches nach einer Änderung durch die Bridge selbst verwerfen."""
+    if config.read_cache is not None:
+        config.read_cache.invalidate(path)
+    _dir_cache.invalidate(path.parent)
+    _git_status_cache.on_change({path})
+
+
+@ToolRegistry.tool("Führt eine Web-Recherche durch", group="web")
 def webrecherche(query: str, max_results: int = 5, lang: str = "de") -> dict:
     """
     Führt eine Web-Recherche durch.
@@ -263,6 +1039,7 @@ def webrecherche(query: str, max_results: int = 5, lang: str = "de") -> dict:
 
     # Wikipedia API (funktioniert zuverlässig)
     if REQUESTS_AVAILABLE:
+        requests = _requests()
         headers = {"User-Agent": "PolylogBridge/1.0"}
         try:
             wiki_url = f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{urllib.parse.quote(query.replace(' ', '_'))}"
@@ -320,64 +1097,2222 @@ def webrecherche(query: str, max_results: int = 5, lang: str = "de") -> dict:
 
 
 # =============================================================================
-# Ollama Client
+# Tools: read_files, list_dir - Projekt-Kontext in einem Tool-Aufruf
 # =============================================================================
 
-@dataclass
-class BridgeConfig:
-    """Konfiguration für die Polylog Bridge."""
-    model: str = "devstral-small-2:latest"
-    ollama_host: str = "http://localhost:11434"
-    max_tokens: int = 4096
-    temperature: float = 0.7
-    timeout: int = 300
-    working_dir: Path = field(default_factory=lambda: Path(".").resolve())
+# Gemeinsames Ausgabe-Budget (Zeichen) pro Aufruf von read_files / list_dir
+BATCH_BUDGET_CHARS = 40000
+MAX_BATCH_FILES = 50
 
+# Verzeichnisse, die beim Auflisten und Globben übersprungen werden
+IGNORED_DIRS = {
+    ".git", "__pycache__", "node_modules", ".venv", "venv",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox", ".polylog"
+}
 
-class OllamaClient:
-    """Ollama Client mit Native Tool-Calling und automatischer API-Erkennung."""
 
-    CHAT_ENDPOINTS = ["/api/chat", "/v1/chat/completions", "/chat"]
-    GENERATE_ENDPOINTS = ["/api/generate", "/generate"]
+class DirCache:
+    """
+    Cache für os.scandir-Ergebnisse.
 
-    def __init__(self, config: BridgeConfig):
-        self.config = config
-        self.base_url = config.ollama_host.rstrip("/")
-        self._working_chat_endpoint: Optional[str] = None
-        self._working_generate_endpoint: Optional[str] = None
-        self._use_openai_format = False
+    Ein Eintrag gilt solange die mtime des Verzeichnisses unverändert ist
+    (Anlegen, Löschen und Umbenennen ändern sie).
+    """
 
-    def _build_prompt_from_messages(self, messages: List[Dict]) -> str:
-        """Konvertiert Messages zu einem einzelnen Prompt für /api/generate."""
-        parts = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if role == "system":
-                parts.append(f"System: {content}")
-            elif role == "assistant":
-                parts.append(f"Assistant: {content}")
+    def __init__(self):
+        # Pfad -> (mtime_ns, [(name, is_dir), ...])
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def listdir(self, path: Path, trusted: bool = False) -> List[tuple]:
+        """
+        Sortierte Einträge (name, is_dir) eines Verzeichnisses.
+
+        trusted: ein FileWatcher beobachtet path - Treffer ohne stat().
+        """
+        key = str(path)
+        if trusted:
+            with self._lock:
+                cached = self._entries.get(key)
+                if cached:
+                    self.hits += 1
+                    return cached[1]
+
+        mtime = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] == mtime:
+                self.hits += 1
+                return cached[1]
+
+        with os.scandir(path) as it:
+            entries = sorted(
+                (entry.name, entry.is_dir(follow_symlinks=False)) for entry in it
+            )
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (mtime, entries)
+        return entries
+
+    def invalidate(self, path: Optional[Path] = None):
+        """Verwirft einen Eintrag oder den ganzen Cache."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
             else:
-                parts.append(f"User: {content}")
-        parts.append("Assistant:")
-        return "\n\n".join(parts)
+                self._entries.pop(str(path), None)
+
+    def on_change(self, paths: Optional[set]):
+        """FileWatcher-Abonnent: Elternverzeichnis und ggf. Teilbaum verwerfen."""
+        if paths is None:
+            self.invalidate()
+            return
+        with self._lock:
+            for path in paths:
+                self._entries.pop(str(path.parent), None)
+                key = str(path)
+                if self._entries.pop(key, None) is not None:
+                    # War ein Verzeichnis: gelöscht/umbenannt → Unterverzeichnisse mit
+                    prefix = key + os.sep
+                    for stale in [k for k in self._entries if k.startswith(prefix)]:
+                        del self._entries[stale]
+
+
+_dir_cache = DirCache()
+
+
+def _relative(path: Path, config: ToolConfig) -> str:
+    """Pfad relativ zum Working Directory (für Ausgaben an das Modell)."""
+    try:
+        return path.relative_to(config.working_dir).as_posix()
+    except ValueError:
+        return str(path)
+
+
+@ToolRegistry.tool("Liest mehrere Dateien auf einmal (Liste oder Glob-Muster)")
+def read_files(paths: Optional[List[str]] = None, pattern: str = "") -> dict:
+    """
+    Liest mehrere Dateien parallel mit gemeinsamem Größenbudget.
+
+    paths: Liste von Dateipfaden (relativ zum Projekt)
+    pattern: Glob-Muster relativ zum Projekt, z.B. src/**/*.py
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Worker-Threads erben den Kontext nicht - Config explizit weitergeben
+    config = get_config()
+    candidates: List[Path] = []
+    skipped: List[Dict[str, Any]] = []
+
+    seen: set = set()
+
+    for p in paths or []:
+        safe_path = _safe_path(p, config)
+        if not safe_path:
+            skipped.append({"path": p, "reason": "ungültiger Pfad"})
+        elif safe_path in seen:
+            continue  # doppelt angegeben - nur einmal lesen und berechnen
+        elif not safe_path.is_file():
+            skipped.append({"path": p, "reason": "nicht gefunden"})
+        else:
+            candidates.append(safe_path)
+        if safe_path:
+            seen.add(safe_path)
+
+    if pattern:
+        matches: List[Path] = []
+        try:
+            for match in config.working_dir.glob(pattern):
+                if len(candidates) + len(matches) > MAX_BATCH_FILES:
+                    break
+                rel_parts = match.relative_to(config.working_dir).parts
+                if IGNORED_DIRS.intersection(rel_parts) or not match.is_file():
+                    continue
+                safe_path = _safe_path(str(match), config)
+                if safe_path and safe_path not in seen:
+                    matches.append(safe_path)
+        except (ValueError, NotImplementedError) as e:
+            return {"success": False, "error": f"Ungültiges Muster '{pattern}': {e}"}
+        candidates.extend(sorted(matches))
+
+    if not candidates:
+        return {"success": False, "error": "Keine Dateien gefunden", "skipped": skipped}
+
+    for extra in candidates[MAX_BATCH_FILES:]:
+        skipped.append({"path": _relative(extra, config), "reason": f"mehr als {MAX_BATCH_FILES} Dateien"})
+    candidates = candidates[:MAX_BATCH_FILES]
+
+    def load(item):
+        path, size, limit = item
+        try:
+            result = _read_cached(path, limit, config)
+            return dict(result, path=_relative(path, config), size=size)
+        except Exception as e:
+            return {"path": _relative(path, config), "error": str(e), "content": ""}
+
+    # Budget nach Dateigröße (Bytes ≥ Zeichen) verteilen und parallel lesen.
+    # Binärdateien und Zusammenfassungen verbrauchen weniger als reserviert -
+    # der Rest geht in einer weiteren Runde an die zurückgestellten Dateien.
+    files: List[Dict[str, Any]] = []
+    pending = []
+    for path in candidates:
+        try:
+            pending.append((path, path.stat().st_size))
+        except OSError as e:
+            # Zwischen Auswahl und Lesen gelöscht o.ä. - nur diese Datei scheitert
+            files.append({"path": _relative(path, config), "error": str(e), "content": ""})
+    remaining = BATCH_BUDGET_CHARS
+
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(pending)))) as pool:
+        while pending and remaining > 0:
+            plan, deferred = [], []
+            reserve = remaining
+            for path, size in pending:
+                if reserve <= 0:
+                    deferred.append((path, size))
+                    continue
+                limit = min(READ_LIMIT_CHARS, reserve)
+                plan.append((path, size, limit))
+                reserve -= min(size, limit)
+
+            results = list(pool.map(load, plan))
+            files.extend(results)
+            remaining -= sum(len(f["content"]) for f in results)
+            pending = deferred
+
+    for path, size in pending:
+        skipped.append({"path": _relative(path, config), "reason": "Budget erschöpft", "size": size})
+
+    # Reihenfolge der Anfrage beibehalten
+    order = {_relative(path, config): i for i, path in enumerate(candidates)}
+    files.sort(key=lambda f: order[f["path"]])
+
+    return {
+        "success": True,
+        "files": files,
+        "skipped": skipped,
+        "budget_chars": BATCH_BUDGET_CHARS,
+        "used_chars": sum(len(f.get("content", "")) for f in files)
+    }
+
+
+@ToolRegistry.tool("Zeigt die Verzeichnisstruktur als Baum")
+def list_dir(path: str = ".", depth: int = 2) -> dict:
+    """
+    Listet ein Verzeichnis rekursiv als Baum.
+
+    path: Verzeichnis relativ zum Projekt (default: .)
+    depth: Maximale Tiefe (default: 2)
+    """
+    safe_path = _safe_path(path)
+    if not safe_path:
+        return {"success": False, "error": f"Ungültiger Pfad: {path}"}
+
+    if not safe_path.is_dir():
+        return {"success": False, "error": f"Kein Verzeichnis: {path}"}
+
+    lines: List[str] = []
+    used = 0
+    truncated = False
+
+    watcher = get_config().watcher
+    if watcher is not None:
+        watcher.flush()
+
+    def walk(directory: Path, level: int):
+        nonlocal used, truncated
+        try:
+            entries = _dir_cache.listdir(directory, watcher is not None and watcher.watches(directory))
+        except OSError as e:
+            lines.append("  " * level + f"[Fehler: {e}]")
+            return
+
+        for name, is_dir in entries:
+            if truncated:
+                return
+            if is_dir and name in IGNORED_DIRS:
+                continue
+            line = "  " * level + name + ("/" if is_dir else "")
+            used += len(line) + 1
+            if used > BATCH_BUDGET_CHARS:
+                truncated = True
+                return
+            lines.append(line)
+            if is_dir and level + 1 < depth:
+                walk(directory / name, level + 1)
+
+    walk(safe_path, 0)
+    if truncated:
+        lines.append("... [truncated]")
+
+    return {
+        "success": True,
+        "path": path,
+        "tree": "\n".join(lines),
+        "entries": len(lines) - (1 if truncated else 0),
+        "truncated": truncated
+    }
+
+
+# =============================================================================
+# Dateisystem-Watcher - hält Caches ohne stat() pro Zugriff aktuell
+# =============================================================================
+
+WATCH_POLL_SECONDS = 5.0
+# Ereignisse bündeln: flushen nach dieser Ruhezeit, spätestens nach MAX_BATCH
+WATCH_DEBOUNCE_SECONDS = 0.05
+WATCH_MAX_BATCH_SECONDS = 0.5
+
+# inotify-Konstanten (linux/inotify.h)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_DONT_FOLLOW = 0x02000000
+_IN_ISDIR = 0x40000000
+_IN_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+    | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR | _IN_DONT_FOLLOW
+)
+
+
+class FileWatcher:
+    """
+    Beobachtet ein Verzeichnis rekursiv und meldet Änderungen gebündelt.
+
+    Linux: inotify über ctypes (kein Zusatzpaket). Sonst - oder wenn inotify
+    nicht nutzbar ist (z.B. fs.inotify.max_user_watches erschöpft) - Polling
+    per os.scandir im Hintergrund. Abonnenten erhalten pro Bündel die Menge
+    der geänderten Pfade, oder None wenn Ereignisse verloren gingen und alles
+    als geändert gelten muss (auch einmal direkt nach dem Start).
+    """
+
+    def __init__(self, root: Path, poll_interval: float = WATCH_POLL_SECONDS,
+                 force_polling: bool = False):
+        self.root = Path(root).resolve()
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.backend: Optional[str] = None  # "inotify" oder "polling"
+        self.batches = 0
+        self.events = 0
+        self._subscribers: List[Callable[[Optional[set]], None]] = []
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._libc = None
+        self._fd = -1
+        self._wds: Dict[int, Path] = {}
+        self._watched: set = set()  # str(Verzeichnis) aller gesetzten Watches
+        # Gelesene, noch nicht gemeldete Ereignisse (Hintergrund-Thread oder flush())
+        self._io_lock = threading.Lock()
+        self._pending: set = set()
+        self._overflow = False
+
+    @property
+    def trusted(self) -> bool:
+        """True wenn Caches Einträge ohne stat() als gültig ansehen dürfen (inotify läuft)."""
+        return (self.backend == "inotify" and self._ready.is_set()
+                and self._thread is not None and self._thread.is_alive())
+
+    def watches(self, directory: Path) -> bool:
+        """
+        True wenn Änderungen in directory sicher gemeldet werden (inotify-Watch
+        gesetzt). IGNORED_DIRS und Pfade außerhalb von root: immer False.
+        """
+        return self.trusted and str(directory) in self._watched
+
+    def flush(self):
+        """
+        Meldet bereits eingetroffene Ereignisse sofort statt nach der Bündelpause -
+        vor einem Cache-Treffer ohne stat() (z.B. read_file direkt nach run_command).
+        """
+        if not self.trusted:
+            return
+        with self._io_lock:
+            if self._drain() and (self._pending or self._overflow):
+                self._emit_pending()
+
+    def subscribe(self, callback: Callable[[Optional[set]], None]):
+        """callback(pfade) nach jedem Bündel; pfade=None heißt: alles verwerfen."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Optional[set]], None]):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def start(self) -> "FileWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="polylog-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wartet, bis die Beobachtung steht (Watches gesetzt bzw. erster Scan fertig)."""
+        return self._ready.wait(timeout)
+
+    def _emit(self, paths: Optional[set]):
+        self.batches += 1
+        self.events += len(paths) if paths else 0
+        for callback in list(self._subscribers):
+            try:
+                callback(paths)
+            except Exception:
+                pass  # ein fehlerhafter Abonnent darf den Watcher nicht stoppen
+
+    def _run(self):
+        if not self.force_polling and self._inotify_init() and self._watch_tree(self.root):
+            self.backend = "inotify"
+            self._ready.set()
+            # Was sich vor dem Setzen der Watches geändert hat, ist unbekannt
+            self._emit(None)
+            self._inotify_loop()
+        else:
+            if self._fd >= 0:
+                os.close(self._fd)
+                self._fd = -1
+            self.backend = "polling"
+            self._poll_loop()
+
+    # -------------------------------------------------------------------------
+    # inotify
+    # -------------------------------------------------------------------------
+
+    def _inotify_init(self) -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        import ctypes
+        import ctypes.util
+
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return False
+        return self._fd >= 0
+
+    def _watch_tree(self, top: Path, found: Optional[set] = None) -> bool:
+        """
+        Setzt Watches auf top und alle Unterverzeichnisse (ohne IGNORED_DIRS).
+        found sammelt vorhandene Einträge - für Verzeichnisse, die erst nach
+        ihrem Inhalt beobachtet werden (mkdir -p, git checkout).
+        """
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _IN_WATCH_MASK)
+            if wd < 0:
+                import ctypes
+                import errno
+
+                if ctypes.get_errno() in (errno.ENOSPC, errno.ENOMEM):
+                    return False  # Watch-Limit erreicht → Polling
+                continue  # Verzeichnis inzwischen weg
+            self._wds[wd] = directory
+            self._watched.add(str(directory))
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if found is not None:
+                            found.add(Path(entry.path))
+                        if entry.is_dir(follow_symlinks=False) and entry.name not in IGNORED_DIRS:
+                            stack.append(Path(entry.path))
+            except OSError:
+                pass
+        return True
+
+    def _drain(self) -> bool:
+        """Liest alle anstehenden inotify-Ereignisse nach _pending (unter _io_lock). False bei Fehler."""
+        import struct
+
+        header = struct.Struct("iIII")  # wd, mask, cookie, len
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                return False
+            if not data:
+                return True
+            offset = 0
+            while offset + header.size <= len(data):
+                wd, mask, _, length = header.unpack_from(data, offset)
+                name = data[offset + header.size:offset + header.size + length].split(b"\0", 1)[0]
+                offset += header.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    self._overflow = True
+                    continue
+                directory = self._wds.get(wd)
+                if directory is None:
+                    continue
+                if mask & _IN_IGNORED:
+                    del self._wds[wd]
+                    self._watched.discard(str(directory))
+                    continue
+                path = directory / os.fsdecode(name) if name else directory
+                self._pending.add(path)
+                if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO) \
+                        and path.name not in IGNORED_DIRS:
+                    if not self._watch_tree(path, self._pending):
+                        self._overflow = True
+
+    def _emit_pending(self):
+        paths, overflow = self._pending, self._overflow
+        self._pending = set()
+        self._overflow = False
+        self._emit(None if overflow else paths)
+
+    def _inotify_loop(self):
+        import select
+
+        first = 0.0
+        while not self._stop.is_set():
+            waiting = self._pending or self._overflow
+            readable, _, _ = select.select([self._fd], [], [], WATCH_DEBOUNCE_SECONDS if waiting else 0.5)
+            with self._io_lock:
+                if readable:
+                    if not (self._pending or self._overflow):
+                        first = time.monotonic()
+                    if not self._drain():
+                        break
+                    if time.monotonic() - first < WATCH_MAX_BATCH_SECONDS:
+                        continue
+                if self._pending or self._overflow:
+                    self._emit_pending()
+
+    # -------------------------------------------------------------------------
+    # Polling (Fallback)
+    # -------------------------------------------------------------------------
+
+    def _snapshot(self) -> Dict[str, tuple]:
+        """Pfad -> (mtime_ns, size) für den ganzen Baum."""
+        state: Dict[str, tuple] = {}
+        stack = [str(self.root)]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    state[entry.path] = (st.st_mtime_ns, st.st_size)
+                    if entry.is_dir(follow_symlinks=False) and entry.name not in IGNORED_DIRS:
+                        stack.append(entry.path)
+        return state
+
+    def _poll_loop(self):
+        previous = self._snapshot()
+        self._ready.set()
+        self._emit(None)
+        interval = self.poll_interval
+
+        while not self._stop.wait(interval):
+            started = time.monotonic()
+            current = self._snapshot()
+            changed = current.keys() ^ previous.keys()
+            changed.update(p for p, stamp in current.items() if previous.get(p, stamp) != stamp)
+            previous = current
+            # Großer Baum: Scan darf höchstens ~10% der Zeit kosten
+            interval = max(self.poll_interval, 10 * (time.monotonic() - started))
+            if changed:
+                self._emit({Path(p) for p in changed})
+
+
+_watchers: Dict[str, FileWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(root: Path) -> FileWatcher:
+    """Gemeinsamer, laufender Watcher pro Verzeichnis (hält auch den DirCache aktuell)."""
+    key = str(Path(root).resolve())
+    with _watchers_lock:
+        if key not in _watchers:
+            watcher = FileWatcher(Path(key))
+            watcher.subscribe(_dir_cache.on_change)
+            watcher.subscribe(_git_status_cache.on_change)
+            _watchers[key] = watcher.start()
+        return _watchers[key]
+
+
+# =============================================================================
+# Tool: git_status - Git-Check vor Schreibzugriffen (Bootblock Regel 10)
+# =============================================================================
+
+# Ohne Watcher kann eine Editor-Änderung im Working Tree unbemerkt bleiben -
+# dann gilt das Ergebnis nur so lange
+GIT_STATUS_TTL_SECONDS = 2.0
+
+
+def find_git_dir(start: Path) -> Optional[tuple]:
+    """(Repository-Wurzel, .git-Verzeichnis) für start oder ein Elternverzeichnis."""
+    for directory in [start, *start.parents]:
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            return directory, dot_git
+        if dot_git.is_file():
+            # Worktree/Submodul: ".git" ist eine Datei mit "gitdir: <pfad>"
+            text = dot_git.read_text(encoding="utf-8", errors="ignore").strip()
+            if text.startswith("gitdir:"):
+                return directory, (directory / text[7:].strip()).resolve()
+    return None
+
+
+class GitStatusCache:
+    """
+    Git-Status pro Repository, ohne git bei jedem Aufruf zu starten.
+
+    HEAD und Branch werden direkt aus .git gelesen (HEAD, loose refs,
+    packed-refs). `git status` läuft nur, wenn sich HEAD, Ref oder Index
+    geändert haben (mtime), write_file bzw. der FileWatcher eine Änderung im
+    Working Tree gemeldet haben - oder ohne Watcher die TTL abgelaufen ist.
+    """
+
+    def __init__(self):
+        # Repository-Wurzel -> (Stempel, Zeitpunkt, Ergebnis)
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.runs = 0  # Anzahl gestarteter git-Prozesse
+
+    @staticmethod
+    def _common_dir(git_dir: Path) -> Path:
+        """Gemeinsames .git-Verzeichnis (bei Worktrees liegen refs dort)."""
+        try:
+            return (git_dir / (git_dir / "commondir").read_text(encoding="utf-8").strip()).resolve()
+        except OSError:
+            return git_dir
+
+    def read_head(self, git_dir: Path) -> tuple:
+        """(Branch oder None bei detached HEAD, Commit-Hash oder None, Ref-Datei)."""
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+        if not head.startswith("ref:"):
+            return None, head, git_dir / "HEAD"
+
+        ref = head[4:].strip()
+        branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+        for base in (git_dir, self._common_dir(git_dir)):
+            try:
+                return branch, (base / ref).read_text(encoding="utf-8").strip(), base / ref
+            except OSError:
+                continue
+
+        packed = self._common_dir(git_dir) / "packed-refs"
+        try:
+            with open(packed, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1] == ref:
+                        return branch, parts[0], packed
+        except OSError:
+            pass
+        return branch, None, packed  # Branch ohne Commit
+
+    @staticmethod
+    def _mtime(path: Path) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def status(self, start: Path, watched: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        Status des Repositories, in dem start liegt.
+
+        watched: Wurzel eines laufenden inotify-Watchers. Deckt er das ganze
+        Repository ab (watched == Repository-Wurzel), entfällt die TTL - liegt
+        start nur in einem Unterverzeichnis, bleiben Änderungen daneben unbemerkt.
+        """
+        found = find_git_dir(start)
+        if found is None:
+            return {"repository": False}
+        root, git_dir = found
+        trusted = watched is not None and Path(watched).resolve() == root.resolve()
+
+        branch, head, ref_file = self.read_head(git_dir)
+        stamp = (head, self._mtime(git_dir / "HEAD"), self._mtime(ref_file), self._mtime(git_dir / "index"))
+
+        key = str(root)
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached and cached[0] == stamp and (trusted or time.monotonic() - cached[1] < GIT_STATUS_TTL_SECONDS):
+            return dict(cached[2], cached=True)
+
+        result = {"repository": True, "root": str(root), "branch": branch, "head": head}
+        result.update(self._run_status(root))
+        with self._lock:
+            self._entries[key] = (stamp, time.monotonic(), result)
+        return dict(result, cached=False)
+
+    def _run_status(self, root: Path) -> Dict[str, Any]:
+        """Geänderte Pfade über `git status --porcelain` (einziger git-Aufruf)."""
+        import subprocess
+
+        self.runs += 1
+        try:
+            proc = subprocess.run(
+                ["git", "-C", str(root), "status", "--porcelain=v1", "-z", "--untracked-files=normal"],
+                capture_output=True, timeout=30,
+                # Status-Aufruf soll den Index nicht neu schreiben (sonst ändert sich dessen mtime)
+                env=dict(os.environ, GIT_OPTIONAL_LOCKS="0"),
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return {"error": f"git status fehlgeschlagen: {e}"}
+        if proc.returncode != 0:
+            return {"error": proc.stderr.decode("utf-8", errors="replace").strip()}
+
+        changed = []
+        entries = proc.stdout.decode("utf-8", errors="replace").split("\0")
+        i = 0
+        while i < len(entries):
+            entry = entries[i]
+            i += 1
+            if len(entry) < 4:
+                continue
+            code, path = entry[:2], entry[3:]
+            if "R" in code or "C" in code:
+                i += 1  # Umbenennung: Quellpfad folgt als eigener Eintrag
+            changed.append({"status": code.strip() or code, "path": path})
+        return {"clean": not changed, "changed": changed}
+
+    def on_change(self, paths: Optional[set]):
+        """FileWatcher-Abonnent bzw. nach write_file: betroffene Repositories verwerfen."""
+        with self._lock:
+            if paths is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                prefix = key + os.sep
+                if any(str(p) == key or str(p).startswith(prefix) for p in paths):
+                    del self._entries[key]
+
+
+_git_status_cache = GitStatusCache()
+
+
+@ToolRegistry.tool("Git-Status des Projekts: clean/dirty, Branch, HEAD-Hash und geänderte Dateien")
+def git_status(max_paths: int = 50) -> dict:
+    """
+    Prüft den Git-Zustand des Projekts (vor Schreibzugriffen, Bootblock Regel 10).
+
+    max_paths: Maximale Anzahl gelisteter Dateien (default: 50)
+    """
+    config = get_config()
+    watched = None
+    if config.watcher is not None and config.watcher.trusted:
+        config.watcher.flush()
+        watched = config.watcher.root
+    try:
+        status = _git_status_cache.status(config.working_dir, watched)
+    except OSError as e:
+        return {"success": False, "error": str(e)}
+
+    if not status["repository"]:
+        return {"success": True, "repository": False}
+    if "error" in status:
+        return {"success": False, "error": status["error"], "branch": status["branch"], "head": status["head"]}
+
+    changed = status["changed"]
+    return {
+        "success": True,
+        "repository": True,
+        "branch": status["branch"],
+        "head": status["head"],
+        "clean": status["clean"],
+        "changed_count": len(changed),
+        "changed": [f"{c['status']} {c['path']}" for c in changed[:max(0, max_paths)]],
+        "truncated": len(changed) > max_paths,
+        "cached": status["cached"],
+    }
+
+
+# =============================================================================
+# Snapshots - Rollback für write_file (Bootblock: "Backups, Tests, Rollback")
+# =============================================================================
+
+SNAPSHOT_DIR = ".polylog/snapshots"
+SNAPSHOT_MAX_BYTES = 256 * 1024 * 1024
+SNAPSHOT_MAX_AGE_DAYS = 30
+CHUNK_MIN_BYTES = 4096
+CHUNK_MAX_BYTES = 65536
+
+
+def _chunks(data: bytes):
+    """
+    Inhaltsabhängige Blöcke an Zeilengrenzen: ein Block endet nach einer
+    Zeile, deren CRC32 durch 16 teilbar ist (mind. 4 KB, max. 64 KB).
+    Einfügen oder Löschen ändert so nur die Blöcke an der Änderungsstelle,
+    der Rest der Datei bleibt dedupliziert.
+    """
+    start = pos = 0
+    size = len(data)
+    while pos < size:
+        newline = data.find(b"\n", pos, start + CHUNK_MAX_BYTES)
+        if newline < 0:
+            # Keine Zeilengrenze in Reichweite (lange Zeile, Binärdaten)
+            pos = min(size, start + CHUNK_MAX_BYTES)
+            cut = True
+        else:
+            line_start, pos = pos, newline + 1
+            cut = pos - start >= CHUNK_MIN_BYTES and zlib.crc32(data[line_start:pos]) & 15 == 0
+        if cut or pos >= size:
+            yield data[start:pos]
+            start = pos
+
+
+class SnapshotStore:
+    """
+    Inhaltsadressierter Snapshot-Speicher unter <working_dir>/.polylog/snapshots.
+
+    chunks/     zlib-komprimierte Blöcke, benannt nach SHA-256 (dedupliziert)
+    manifests/  pro Dateiversion (SHA-256 des Inhalts) die Liste ihrer Blöcke
+    journal.jsonl  pro write_file: Pfad, Hash vorher/nachher, Session, Zeit
+
+    lock        Sperrdatei (flock) - mehrere Bridges/Prozesse im selben Projekt
+
+    Vor dem Überschreiben wird nur gespeichert, was noch nicht im Speicher
+    liegt - bei kleinen Änderungen an großen Dateien ein paar KB statt einer
+    Vollkopie. undo() und restore() arbeiten pro Session; gc() hält den
+    Speicher unter max_bytes und verwirft Einträge älter als max_age_days.
+    Alles, was schreibt, läuft unter der Sperre.
+    """
+
+    def __init__(self, root: Path, session: str, max_bytes: int = SNAPSHOT_MAX_BYTES,
+                 max_age_days: float = SNAPSHOT_MAX_AGE_DAYS):
+        self.root = Path(root).resolve()
+        self.directory = self.root / SNAPSHOT_DIR
+        self.session = session
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._journal = self.directory / "journal.jsonl"
+        self._size: Optional[int] = None  # Größe von chunks/ (lazy, Schätzung bei mehreren Prozessen)
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._depth = 0
+
+    @contextmanager
+    def _locked(self):
+        """Exklusiv für Threads und andere Prozesse/Stores im selben Projekt (reentrant)."""
+        with self._lock:
+            if self._depth == 0:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._lock_file = open(self.directory / "lock", "a+b")
+                if IS_WINDOWS:
+                    import msvcrt
+                    while True:
+                        try:
+                            msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue  # LK_LOCK gibt nach 10 s auf
+                else:
+                    import fcntl
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    if IS_WINDOWS:
+                        import msvcrt
+                        msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                    self._lock_file.close()  # gibt den flock frei
+                    self._lock_file = None
+
+    # --- Inhalte -----------------------------------------------------------
+
+    def _setup(self, collect: bool = True):
+        if self._size is not None:
+            return
+        with self._locked():
+            (self.directory / "chunks").mkdir(parents=True, exist_ok=True)
+            (self.directory / "manifests").mkdir(exist_ok=True)
+            ignore = self.root / ".polylog" / ".gitignore"
+            if not ignore.exists():
+                ignore.write_text("*\n", encoding="utf-8")  # nicht im git status auftauchen
+            self._size = sum(size for _, size in self._chunk_files())
+            if collect:
+                self.gc()
+
+    def _chunk_files(self):
+        """(Hash, Größe) aller gespeicherten Blöcke."""
+        base = self.directory / "chunks"
+        for prefix in os.scandir(base):
+            if prefix.is_dir():
+                for entry in os.scandir(prefix.path):
+                    if not entry.name.endswith(".tmp"):
+                        yield entry.name, entry.stat().st_size
+
+    def _chunk_path(self, digest: str) -> Path:
+        return self.directory / "chunks" / digest[:2] / digest
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def put(self, data: bytes) -> str:
+        """Speichert einen Dateiinhalt (nur neue Blöcke), gibt dessen SHA-256 zurück."""
+        import hashlib
+
+        digest = hashlib.sha256(data).hexdigest()
+        manifest = self.directory / "manifests" / digest
+        with self._locked():
+            self._setup()
+            if manifest.exists():
+                return digest
+            hashes = []
+            for chunk in _chunks(data):
+                chunk_hash = hashlib.sha256(chunk).hexdigest()
+                hashes.append(chunk_hash)
+                # Immer auf der Platte prüfen - gc() eines anderen Stores kann Blöcke löschen
+                path = self._chunk_path(chunk_hash)
+                if not path.exists():
+                    path.parent.mkdir(exist_ok=True)
+                    packed = zlib.compress(chunk, 6)
+                    self._write_atomic(path, packed)
+                    self._size += len(packed)
+            self._write_atomic(manifest, "\n".join(hashes).encode("ascii"))
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Dateiinhalt zu einem SHA-256."""
+        manifest = (self.directory / "manifests" / digest).read_text(encoding="ascii")
+        return b"".join(
+            zlib.decompress(self._chunk_path(h).read_bytes()) for h in manifest.split("\n") if h
+        )
+
+    # --- Journal -----------------------------------------------------------
+
+    def _read_journal(self) -> List[Dict[str, Any]]:
+        entries = []
+        try:
+            with open(self._journal, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue  # z.B. abgebrochene letzte Zeile
+        except OSError:
+            pass
+        return entries
+
+    def _append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Hängt einen Eintrag an (nur unter _locked - seq ist dann projektweit eindeutig)."""
+        seq = max((e["seq"] for e in self._read_journal()), default=0) + 1
+        entry = dict(seq=seq, time=time.time(), session=self.session, **entry)
+        with open(self._journal, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    def record(self, path: Path, old: Optional[bytes], new: Optional[bytes]) -> Dict[str, Any]:
+        """Journal-Eintrag für eine Änderung (old/new None: Datei existierte nicht)."""
+        with self._locked():
+            self._setup()
+            entry = self._append({
+                "path": Path(path).resolve().relative_to(self.root).as_posix(),
+                "old": self.put(old) if old is not None else None,
+                "new": self.put(new) if new is not None else None,
+            })
+            if self._size > self.max_bytes:
+                self.gc()
+        return entry
+
+    def entries(self, session: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Journal-Einträge (Default: dieser Session), älteste zuerst."""
+        session = self.session if session is None else session
+        return [e for e in self._read_journal() if session == "*" or e["session"] == session]
+
+    def _undoable(self) -> List[Dict[str, Any]]:
+        entries = self.entries()
+        undone = {e["undo_of"] for e in entries if "undo_of" in e}
+        return [e for e in entries if "undo_of" not in e and e["seq"] not in undone]
+
+    def _revert(self, entry: Dict[str, Any], force: bool) -> Dict[str, Any]:
+        """Setzt die Datei eines Eintrags auf den Stand davor zurück."""
+        import hashlib
+
+        path = self.root / entry["path"]
+        try:
+            current = path.read_bytes()
+        except FileNotFoundError:
+            current = None
+        current_hash = hashlib.sha256(current).hexdigest() if current is not None else None
+        if current_hash != entry["new"] and not force:
+            return {"path": entry["path"], "seq": entry["seq"], "success": False,
+                    "error": "Datei wurde seitdem geändert (force=True überschreibt)"}
+
+        if entry["old"] is None:
+            if current is not None:
+                path.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._write_atomic(path, self.get(entry["old"]))
+        self._append({"path": entry["path"], "old": current_hash, "new": entry["old"],
+                      "undo_of": entry["seq"]})
+        return {"path": entry["path"], "seq": entry["seq"], "success": True,
+                "restored": "gelöscht (war neu)" if entry["old"] is None else entry["old"][:12]}
+
+    def undo(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Macht den letzten write_file dieser Session rückgängig (None: nichts zu tun)."""
+        with self._locked():
+            self._setup()
+            pending = self._undoable()
+            return self._revert(pending[-1], force) if pending else None
+
+    def restore(self, seq: Optional[int] = None, timestamp: Optional[float] = None,
+                force: bool = False) -> List[Dict[str, Any]]:
+        """
+        Point-in-time: macht alle Änderungen dieser Session ab Eintrag seq bzw.
+        ab timestamp rückgängig (neueste zuerst).
+        """
+        with self._locked():
+            self._setup()
+            todo = [e for e in self._undoable()
+                    if (seq is not None and e["seq"] >= seq) or (timestamp is not None and e["time"] >= timestamp)]
+            return [self._revert(e, force) for e in reversed(todo)]
+
+    # --- Aufräumen ---------------------------------------------------------
+
+    def gc(self) -> Dict[str, int]:
+        """Verwirft alte Journal-Einträge und nicht mehr referenzierte Versionen/Blöcke."""
+        with self._locked():
+            self._setup(collect=False)
+            entries = self._read_journal()
+            cutoff = time.time() - self.max_age_days * 86400
+            keep = [e for e in entries if e["time"] >= cutoff]
+            stats = {"entries_dropped": 0, "chunks_deleted": 0, "bytes_freed": 0}
+
+            while True:
+                self._sweep(keep, stats)
+                if self._size <= self.max_bytes or not keep:
+                    break
+                # Immer noch zu groß: älteste Einträge zuerst verwerfen
+                keep = keep[max(1, len(keep) // 4):]
+
+            stats["entries_dropped"] = len(entries) - len(keep)
+            if stats["entries_dropped"]:
+                data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in keep)
+                self._write_atomic(self._journal, data.encode("utf-8"))
+            return stats
+
+    def _sweep(self, keep: List[Dict[str, Any]], stats: Dict[str, int]):
+        """Löscht Manifeste/Blöcke, die kein Eintrag in keep mehr braucht."""
+        live = {e[k] for e in keep for k in ("old", "new") if e.get(k)}
+        live_chunks: set = set()
+        for entry in os.scandir(self.directory / "manifests"):
+            if entry.name.endswith(".tmp"):
+                continue
+            if entry.name in live:
+                with open(entry.path, encoding="ascii") as f:
+                    live_chunks.update(h for h in f.read().split("\n") if h)
+            else:
+                os.remove(entry.path)
+
+        size = 0
+        for name, chunk_size in list(self._chunk_files()):
+            if name in live_chunks:
+                size += chunk_size
+            else:
+                os.remove(self._chunk_path(name))
+                stats["chunks_deleted"] += 1
+                stats["bytes_freed"] += chunk_size
+        self._size = size
+
+    def usage(self) -> Dict[str, int]:
+        with self._locked():
+            self._setup()
+            return {"bytes": self._size, "entries": len(self._read_journal())}
+
+
+# =============================================================================
+# Tool: run_command - Tests, Linter & Co. im Projekt ausführen
+# =============================================================================
+
+COMMAND_DEFAULT_TIMEOUT = 60
+COMMAND_MAX_TIMEOUT = 600
+# Ausgabe an das Modell: Anfang + Ende, dazwischen wird ausgelassen
+COMMAND_HEAD_BYTES = 4096
+COMMAND_TAIL_BYTES = 8192
+
+
+class OutputRing:
+    """
+    Begrenzter Ausgabepuffer: die ersten head Bytes plus ein Ringpuffer
+    der letzten tail Bytes. Der Speicher bleibt konstant, egal wie viel
+    ein Prozess ausgibt.
+    """
+
+    def __init__(self, head: int = COMMAND_HEAD_BYTES, tail: int = COMMAND_TAIL_BYTES):
+        self.head_limit = head
+        self.tail_limit = tail
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, chunk: bytes):
+        self.total += len(chunk)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self.tail += chunk
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    def text(self) -> str:
+        """Anfang + Ende als Text, mit Hinweis auf ausgelassene Bytes."""
+        skipped = self.total - len(self.head) - len(self.tail)
+        middle = f"\n... [{skipped} Bytes ausgelassen] ...\n" if skipped > 0 else ""
+        return (self.head.decode("utf-8", "replace") + middle
+                + self.tail.decode("utf-8", "replace"))
+
+
+def _limit_cpu(command: str, seconds: int) -> str:
+    """
+    CPU-Zeit begrenzen (POSIX): ulimit in der Shell selbst statt preexec_fn -
+    preexec_fn kann in Programmen mit Threads das Kind blockieren.
+    """
+    return f"ulimit -t {seconds} 2>/dev/null\n{command}"
+
+
+def _kill_tree(process):
+    """Beendet den Prozess samt Kindern (eigene Prozessgruppe unter POSIX)."""
+    try:
+        if IS_WINDOWS:
+            process.kill()
+        else:
+            import signal
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, OSError):
+        pass
+
+
+@ToolRegistry.tool("Führt einen Shell-Befehl im Projekt aus (z.B. Tests, Linter)", mutating=True,
+                   group="befehle")
+def run_command(command: str, cwd: str = ".", timeout: int = COMMAND_DEFAULT_TIMEOUT) -> dict:
+    """
+    Führt einen Befehl im Working Directory aus.
+
+    command: Shell-Befehl, z.B. python -m pytest -q
+    cwd: Arbeitsverzeichnis relativ zum Projekt (default: .)
+    timeout: Maximale Laufzeit in Sekunden (default: 60)
+    """
+    import subprocess
+
+    config = get_config()
+    if not config.allow_commands:
+        return {"success": False, "error": "run_command deaktiviert (--allow-commands)"}
+
+    safe_cwd = _safe_path(cwd, config)
+    if not safe_cwd or not safe_cwd.is_dir():
+        return {"success": False, "error": f"Ungültiges Verzeichnis: {cwd}"}
+
+    timeout = max(1, min(int(timeout), COMMAND_MAX_TIMEOUT))
+    output = OutputRing()
+    started = time.monotonic()
+
+    try:
+        process = subprocess.Popen(
+            command if IS_WINDOWS else _limit_cpu(command, timeout),
+            shell=True,
+            cwd=str(safe_cwd),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            # Eigene Prozessgruppe, damit beim Timeout auch Kindprozesse enden
+            start_new_session=not IS_WINDOWS,
+        )
+    except OSError as e:
+        return {"success": False, "error": str(e)}
+
+    def pump():
+        # Gestreamt lesen - nie die ganze Ausgabe im Speicher
+        for chunk in iter(lambda: process.stdout.read1(65536), b""):
+            output.write(chunk)
+
+    reader = threading.Thread(target=pump, name="polylog-command-output", daemon=True)
+    reader.start()
+
+    timed_out = False
+    try:
+        process.wait(timeout=timeout)
+        # Hintergrund-Kinder (cmd &) halten sonst die Pipe offen
+        _kill_tree(process)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        _kill_tree(process)
+        process.wait()
+    except BaseException:
+        # Ctrl+C: Befehl nicht verwaist weiterlaufen lassen
+        _kill_tree(process)
+        raise
+    reader.join(timeout=5)
+    process.stdout.close()
+
+    exit_code = process.returncode
+    return {
+        "success": exit_code == 0 and not timed_out,
+        "command": command,
+        "exit_code": exit_code,
+        "timed_out": timed_out,
+        "duration_seconds": round(time.monotonic() - started, 3),
+        "output": output.text(),
+        "output_bytes": output.total,
+        "truncated": output.total > len(output.head) + len(output.tail),
+    }
+
+
+# =============================================================================
+# Tool-Calls aus Textantworten
+# =============================================================================
+
+class ToolCallParser:
+    """
+    Erkennt Tool-Calls, die ein Modell als Text statt als tool_calls ausgibt.
+
+    Formate:
+        <tool_call>{"name": ..., "arguments": {...}}</tool_call>   (Qwen/Hermes, /api/generate)
+        [TOOL_CALLS][{"name": ..., "arguments": {...}}]             (Mistral/Devstral)
+        [TOOL_CALLS]name[ARGS]{...}                                 (Mistral, neueres Template)
+        <function=name>{...}</function>                             (Llama 3.x)
+        <function=name><parameter=key>wert</parameter></function>   (Qwen3-Coder)
+        ```json {"name": ..., "arguments": {...}} ```               (Code-Block)
+        {"name": ..., "arguments": {...}}                           (Antwort ist nur JSON)
+
+    Kandidaten werden gegen die ToolRegistry-Schemas geprüft - was nicht
+    passt, bleibt normaler Text. Code-Block und nacktes JSON ohne Marker
+    gelten nur für Tools ohne Seiteneffekte: ein write_file/run_command als
+    Beispiel in einer Erklärung wird nicht ausgeführt. feed() nimmt
+    gestreamte Teile an und gibt den Text zurück, der sicher zu keinem
+    Tool-Call gehört (sofort anzeigbar); finish() wertet danach alles aus.
+    """
+
+    LOOSE_FORMATS = ("fenced", "json")
+    MARKERS = ("<tool_call>", "[TOOL_CALLS]", "<function=", "```")
+
+    def __init__(self):
+        self._buffer = ""
+        self._emitted = 0
+        self._holding = False
+        self.formats: List[str] = []  # Formate der erkannten Calls
+
+    def feed(self, chunk: str) -> str:
+        """Nimmt ein Stück Text an, gibt den sicher anzeigbaren Teil zurück."""
+        self._buffer += chunk
+        if self._holding:
+            return ""
+
+        text = self._buffer
+        if not text[:self._emitted].strip() and text.lstrip().startswith(("{", "[")):
+            self._holding = True  # Antwort beginnt mit JSON
+            return ""
+
+        found = [i for i in (text.find(m, self._emitted) for m in self.MARKERS) if i >= 0]
+        if found:
+            end = min(found)
+            self._holding = True
+        else:
+            # Angefangenen Marker am Ende zurückhalten
+            end = len(text)
+            for marker in self.MARKERS:
+                for n in range(len(marker) - 1, 0, -1):
+                    if text.endswith(marker[:n]):
+                        end = min(end, len(text) - n)
+                        break
+            end = max(end, self._emitted)
+
+        safe = text[self._emitted:end]
+        self._emitted = end
+        return safe
+
+    def finish(self) -> tuple:
+        """(Text ohne Tool-Calls, Tool-Calls im /api/chat-Format) für den gesamten Text."""
+        return self.parse(self._buffer)
+
+    def parse(self, text: str) -> tuple:
+        """Wie finish(), für einen vollständigen Text."""
+        import re
+
+        decoder = json.JSONDecoder()
+        spans: List[tuple] = []  # (start, end, [(name, args)], format)
+
+        def decode_at(pos: int) -> tuple:
+            """JSON-Wert ab pos (Leerraum wird übersprungen) → (wert, ende) oder (None, pos)."""
+            while pos < len(text) and text[pos].isspace():
+                pos += 1
+            try:
+                return decoder.raw_decode(text, pos)
+            except ValueError:
+                return None, pos
+
+        def closing(pos: int, tag: str) -> int:
+            match = re.compile(r"\s*" + re.escape(tag)).match(text, pos)
+            return match.end() if match else pos
+
+        for match in re.finditer(r"<tool_call>", text):
+            value, end = decode_at(match.end())
+            if value is not None:
+                spans.append((match.start(), closing(end, "</tool_call>"), self._calls(value), "tool_call"))
+
+        for match in re.finditer(r"\[TOOL_CALLS\]", text):
+            named = re.compile(r"\s*([\w.-]+)\s*\[ARGS\]").match(text, match.end())
+            if named:
+                value, end = decode_at(named.end())
+                if isinstance(value, dict):
+                    spans.append((match.start(), end, [(named.group(1), value)], "mistral"))
+            else:
+                value, end = decode_at(match.end())
+                if value is not None:
+                    spans.append((match.start(), end, self._calls(value), "mistral"))
+
+        for match in re.finditer(r"<function=([\w.-]+)>", text):
+            name = match.group(1)
+            value, end = decode_at(match.end())
+            if isinstance(value, dict):
+                spans.append((match.start(), closing(end, "</function>"), [(name, value)], "function"))
+                continue
+            body_end = text.find("</function>", match.end())
+            if body_end < 0:
+                continue
+            args = {}
+            for param in re.finditer(r"<parameter=([\w.-]+)>\s*(.*?)\s*</parameter>",
+                                     text[match.end():body_end], re.DOTALL):
+                try:
+                    args[param.group(1)] = json.loads(param.group(2))
+                except ValueError:
+                    args[param.group(1)] = param.group(2)
+            spans.append((match.start(), body_end + len("</function>"), [(name, args)], "function"))
+
+        for match in re.finditer(r"```(?:json|tool_call|tool_code|tool)?[ \t]*\n?(.*?)```", text, re.DOTALL):
+            try:
+                value = json.loads(match.group(1))
+            except ValueError:
+                continue
+            spans.append((match.start(), match.end(), self._calls(value), "fenced"))
+
+        stripped = text.strip()
+        if stripped.startswith(("{", "[")):
+            try:
+                value = json.loads(stripped)
+                spans.append((0, len(text), self._calls(value), "json"))
+            except ValueError:
+                pass
+
+        # Gültige, nicht überlappende Kandidaten übernehmen (frühester zuerst)
+        calls: List[Dict] = []
+        accepted: List[tuple] = []
+        for start, end, candidates, fmt in sorted(spans, key=lambda s: (s[0], -s[1])):
+            if not candidates or any(start < a_end and a_start < end for a_start, a_end in accepted):
+                continue
+            if fmt in self.LOOSE_FORMATS and any(ToolRegistry.is_mutating(name) for name, _ in candidates):
+                continue  # Seiteneffekte nur mit explizitem Marker
+            checked = []
+            for name, args in candidates:
+                args, error = ToolRegistry.check_arguments(name, args)
+                if error:
+                    break
+                checked.append({"function": {"name": name, "arguments": args}})
+            else:
+                accepted.append((start, end))
+                calls.extend(checked)
+                self.formats.append(fmt)
+
+        if not calls:
+            return text, []
+        remaining = ""
+        last = 0
+        for start, end in sorted(accepted):
+            remaining += text[last:start]
+            last = end
+        remaining += text[last:]
+        return re.sub(r"\n{3,}", "\n\n", remaining).strip(), calls
+
+    @staticmethod
+    def _calls(value: Any) -> List[tuple]:
+        """Normalisiert {"name", "arguments"|"parameters"} bzw. Listen davon zu [(name, args)]."""
+        items = value if isinstance(value, list) else [value]
+        calls = []
+        for item in items:
+            if not isinstance(item, dict):
+                return []
+            if isinstance(item.get("function"), dict):
+                item = item["function"]  # OpenAI-Form
+            name = item.get("name")
+            args = item.get("arguments", item.get("parameters", {}))
+            if isinstance(args, str):
+                try:
+                    args = json.loads(args)
+                except ValueError:
+                    return []
+            if not isinstance(name, str):
+                return []
+            calls.append((name, args if args is not None else {}))
+        return calls
+
+
+def parse_text_tool_calls(text: str) -> tuple:
+    """
+    Tool-Calls aus einer Textantwort (siehe ToolCallParser).
+
+    Returns:
+        (Text ohne Tool-Calls, Tool-Calls, erkannte Formate)
+    """
+    parser = ToolCallParser()
+    content, calls = parser.parse(text)
+    return content, calls, parser.formats
+
+
+# =============================================================================
+# Ollama Client
+# =============================================================================
+
+def _num_parallel() -> int:
+    """OLLAMA_NUM_PARALLEL als Zahl ≥ 1 (leer, "auto" o.ä. → 1)."""
+    try:
+        return max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL") or 1))
+    except ValueError:
+        return 1
+
+
+@dataclass
+class BridgeConfig:
+    """Konfiguration für die Polylog Bridge."""
+    model: str = "devstral-small-2:latest"
+    ollama_host: str = "http://localhost:11434"
+    max_tokens: int = 4096
+    temperature: float = 0.7
+    seed: Optional[int] = None  # fester Seed → reproduzierbare Antworten
+    # Ollama-Laufzeitoptionen (num_ctx, num_batch, num_thread, num_gpu, ...);
+    # ohne Angabe gilt das per --autotune gespeicherte Profil für Host + Modell
+    runtime_options: Dict[str, Any] = field(default_factory=dict)
+    use_tuned_options: bool = True
+    timeout: int = 300  # Lese-Timeout: max. Wartezeit auf das erste Byte der Antwort
+    connect_timeout: float = 5.0  # Verbindungsaufbau - schlägt bei totem Server schnell fehl
+    keep_alive: str = "30m"  # Wie lange Ollama das Modell nach einer Anfrage im Speicher hält
+    working_dir: Path = field(default_factory=lambda: Path(".").resolve())
+    # Wiederholungen bei transienten Fehlern (Verbindungsabbruch, 502/503/504)
+    max_retries: int = 2
+    retry_backoff: float = 0.5  # Basis in Sekunden, exponentiell mit Jitter
+    # Hedging: nach hedge_after Sekunden parallel an den nächsten Host senden
+    fallback_hosts: List[str] = field(default_factory=list)
+    hedge_after: Optional[float] = None  # None = kein Hedging
+    # Circuit Breaker: nach N Fehlern in Folge für cooldown Sekunden sofort abbrechen
+    breaker_threshold: int = 3
+    breaker_cooldown: float = 30.0
+    # Tool-Loop: max. Inferenz-Runden und optionales Zeitbudget pro Anfrage
+    max_iterations: int = 5
+    max_turn_seconds: Optional[float] = None
+    # Profiling: CPU-/Speicherprofil jeder Anfrage in dieses Verzeichnis schreiben
+    profile_dir: Optional[Path] = None
+    # Admission Control: Plätze am Server (OLLAMA_NUM_PARALLEL), Priorität und Session
+    max_in_flight: int = field(default_factory=_num_parallel)
+    priority: str = "interactive"  # oder "batch"
+    session_id: Optional[str] = None  # None = eigene Session pro Client
+    # run_command: Befehle im Working Directory ausführen (Default: aus)
+    allow_commands: bool = False
+    # Antwort-Cache auf der Platte - greift nur bei temperature 0 oder festem Seed
+    response_cache_dir: Optional[Path] = None
+    response_cache_max_bytes: int = 256 * 1024 * 1024
+    # Dateisystem-Watcher (inotify, sonst Polling) für Read-/Verzeichnis-Cache
+    watch_files: bool = False
+    # Snapshot-Journal unter <working_dir>/.polylog für /undo und /restore
+    snapshots: bool = True
+    snapshot_max_bytes: int = SNAPSHOT_MAX_BYTES
+
+
+class CircuitOpenError(RuntimeError):
+    """Host ist als ungesund markiert - Anfrage wird nicht gesendet."""
+
+
+class CancelledError(RuntimeError):
+    """Anfrage wurde abgebrochen (Ctrl+C oder cancel())."""
+
+
+# Stop-Signal des laufenden Hedge-Versuchs (gesetzt, sobald ein anderer Host gewonnen hat)
+_hedge_stop: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    "polylog_hedge_stop", default=None
+)
+
+
+class CircuitBreaker:
+    """
+    Einfacher Circuit Breaker pro Host.
+
+    closed    → Anfragen laufen normal, Fehler werden gezählt
+    open      → nach `threshold` Fehlern in Folge: sofortiger Abbruch
+    half-open → nach `cooldown` Sekunden darf eine Probe-Anfrage durch
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """True wenn eine Anfrage gesendet werden darf."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """Sekunden bis zur nächsten Probe-Anfrage."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Probe ohne Ergebnis (z.B. abgebrochen): nächste Anfrage darf wieder proben."""
+        with self._lock:
+            self._probing = False
+
+
+class AdmissionScheduler:
+    """
+    Client-seitige Zulassung von Anfragen an einen Ollama-Host.
+
+    Ollama bearbeitet nur OLLAMA_NUM_PARALLEL Anfragen gleichzeitig, der Rest
+    wartet serverseitig - ohne Rücksicht darauf, wer wartet. Hier warten
+    Anfragen stattdessen in der Bridge:
+      - höchstens max_in_flight Anfragen gleichzeitig am Server
+      - Prioritätsklassen: interactive vor batch
+      - innerhalb einer Klasse reihum pro Session (eine Session mit vielen
+        Anfragen verdrängt keine anderen)
+    """
+
+    PRIORITIES = ("interactive", "batch")
+
+    def __init__(self, max_in_flight: int = 1):
+        from collections import OrderedDict
+
+        self.max_in_flight = max(1, max_in_flight)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        # Priorität -> Session -> wartende Tickets (FIFO); Sessions reihum
+        self._queues = {p: OrderedDict() for p in self.PRIORITIES}
+
+    def _waiting(self) -> int:
+        return sum(len(q) for queues in self._queues.values() for q in queues.values())
+
+    def _grant_next(self):
+        """Vergibt freie Plätze: höchste Priorität zuerst, darin reihum pro Session."""
+        for priority in self.PRIORITIES:
+            sessions = self._queues[priority]
+            while sessions and self._in_flight < self.max_in_flight:
+                session, tickets = next(iter(sessions.items()))
+                tickets.popleft()["granted"] = True
+                self._in_flight += 1
+                if tickets:
+                    sessions.move_to_end(session)
+                else:
+                    del sessions[session]
+        self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session: str, priority: str = "interactive"):
+        """
+        Wartet auf einen freien Platz und hält ihn für die Dauer des Blocks.
+
+        Liefert die Wartezeit in Sekunden.
+        """
+        from collections import deque
+
+        if priority not in self._queues:
+            raise ValueError(f"Unbekannte Priorität: {priority}")
+
+        started = time.monotonic()
+        ticket = {"granted": False}
+        with self._cond:
+            self._queues[priority].setdefault(session, deque()).append(ticket)
+            self._grant_next()
+            try:
+                while not ticket["granted"]:
+                    self._cond.wait()
+            except BaseException:
+                # Abbruch beim Warten (z.B. Ctrl+C): Ticket zurückziehen bzw. Platz freigeben
+                if ticket["granted"]:
+                    self._in_flight -= 1
+                else:
+                    tickets = self._queues[priority].get(session)
+                    if tickets is not None:
+                        tickets.remove(ticket)
+                        if not tickets:
+                            del self._queues[priority][session]
+                self._grant_next()
+                raise
+
+        try:
+            yield time.monotonic() - started
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._grant_next()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Aktuelle Belegung (für /stats)."""
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "waiting": {p: sum(len(q) for q in self._queues[p].values()) for p in self.PRIORITIES},
+            }
+
+
+# Ein Scheduler pro Ollama-Host, geteilt von allen Bridges im Prozess
+_schedulers: Dict[str, AdmissionScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(host: str, max_in_flight: int = 1) -> AdmissionScheduler:
+    """Gemeinsamer Scheduler für einen Host (Limit wird beim ersten Aufruf festgelegt)."""
+    with _schedulers_lock:
+        if host not in _schedulers:
+            _schedulers[host] = AdmissionScheduler(max_in_flight)
+        return _schedulers[host]
+
+
+class ResponseCache:
+    """
+    Antwort-Cache auf der Platte für deterministische Anfragen.
+
+    Schlüssel ist ein SHA-256 über die kanonische JSON-Form von Modell,
+    Optionen, Nachrichten und Tool-Schemas. Nur bei temperature 0 oder festem
+    Seed sinnvoll - sonst wäre die Wiederholung nicht dieselbe Antwort.
+    Verdrängung nach LRU (letzter Zugriff = mtime der Datei), bis der Cache
+    wieder unter max_bytes liegt.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 256 * 1024 * 1024,
+                 metrics: Optional[BridgeMetrics] = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.metrics = metrics or BridgeMetrics()
+        self._size: Optional[int] = None  # wird beim ersten Schreiben ermittelt
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        """Kanonischer Hash einer Anfrage (Schlüsselreihenfolge egal)."""
+        import hashlib
+
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Gespeicherte Antwort oder None."""
+        path = self._path(key)
+        try:
+            value = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)  # als zuletzt benutzt markieren
+        except (OSError, ValueError):
+            self.metrics.incr("response_cache.misses")
+            return None
+        self.metrics.incr("response_cache.hits")
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Speichert eine Antwort (atomar) und verdrängt bei Bedarf alte Einträge."""
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        with self._lock:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                if self._size is None:
+                    self._size = sum(size for _, size, _ in self._entries())
+                tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+            except OSError:
+                return  # Cache ist optional - Fehler beim Schreiben ignorieren
+            self._size += len(data)
+            self.metrics.incr("response_cache.stores")
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[tuple]:
+        """(mtime, size, path) aller Einträge."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def _evict(self):
+        """Löscht die am längsten unbenutzten Einträge bis auf 90% von max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.metrics.incr("response_cache.evictions")
+        self._size = total
+
+    def clear(self):
+        """Leert den Cache."""
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+
+class OllamaClient:
+    """Ollama Client mit Native Tool-Calling und automatischer API-Erkennung."""
+
+    CHAT_ENDPOINTS = ["/api/chat", "/v1/chat/completions", "/chat"]
+    GENERATE_ENDPOINTS = ["/api/generate", "/generate"]
+
+    # Transiente Server-Fehler, die eine Wiederholung rechtfertigen
+    RETRY_STATUS = (502, 503, 504)
+
+    def __init__(self, config: BridgeConfig, metrics: Optional[BridgeMetrics] = None):
+        self.config = config
+        self.metrics = metrics or BridgeMetrics()
+        self.base_url = config.ollama_host.rstrip("/")
+        self.hosts = [self.base_url] + [h.rstrip("/") for h in config.fallback_hosts]
+        self._breakers = {
+            host: CircuitBreaker(config.breaker_threshold, config.breaker_cooldown)
+            for host in self.hosts
+        }
+        self._hedge_pool = None
+        self.scheduler = get_scheduler(self.base_url, config.max_in_flight)
+        self.session_id = config.session_id or f"session-{id(self):x}"
+        self._working_chat_endpoint: Optional[str] = None
+        self._working_generate_endpoint: Optional[str] = None
+        self._use_openai_format = False
+        # Verhindert parallele Endpunkt-Erkennung (Preload im Hintergrund vs. erste Anfrage)
+        self._discovery_lock = threading.Lock()
+        # /api/generate: von Ollama zurückgegebener Kontext (Token-IDs) der Session
+        self._gen_context: Optional[List[int]] = None
+        self._gen_covered = 0          # Anzahl Nachrichten, die der Kontext abdeckt
+        self._gen_fingerprint = ""     # Fingerprint dieser Nachrichten
+        self._gen_tools: set = set()   # Tools, deren Beschreibung der Kontext enthält
+        # Abbruch: laufende Streams werden geschlossen, Ollama beendet die Generierung
+        self._cancel = threading.Event()
+        self._active: Dict[Any, Optional[threading.Event]] = {}  # Stream -> Hedge-Stop
+        self._active_lock = threading.Lock()
+        # Laufzeit-Statistik der letzten Antwort (Ollama-Felder, in Sekunden/Tokens)
+        self.last_stats: Dict[str, float] = {}
+        self._stats_listeners: List[Callable[[Dict[str, float]], None]] = []
+        self._tuned: Optional[Dict[str, Any]] = None  # Autotune-Profil (lazy)
+        self.response_cache: Optional[ResponseCache] = None
+        if config.response_cache_dir is not None:
+            self.response_cache = ResponseCache(
+                config.response_cache_dir, config.response_cache_max_bytes, self.metrics
+            )
+        self._digest: Optional[tuple] = None  # (Zeitpunkt, Digest laut /api/tags)
+
+    @property
+    def stateless(self) -> bool:
+        """
+        True wenn jede Anfrage den vollständigen Verlauf sendet (/api/chat).
+        Bei /api/generate hält Ollama den Verlauf als Kontext - nachträgliche
+        Änderungen daran erzwingen dort einen kompletten Neuaufbau.
+        """
+        return self._working_generate_endpoint is None or self._working_chat_endpoint is not None
+
+    @property
+    def deterministic(self) -> bool:
+        """True wenn gleiche Anfragen gleiche Antworten liefern (temperature 0 / Seed)."""
+        return self.config.temperature == 0 or self.config.seed is not None
+
+    def model_digest(self) -> str:
+        """
+        Digest des Modells laut /api/tags - ändert sich, wenn ollama pull die
+        Gewichte unter demselben Tag ersetzt. "" wenn unbekannt (max. 60 s gecacht).
+        """
+        if self._digest is not None and time.monotonic() - self._digest[0] < 60:
+            return self._digest[1]
+        names = {self.config.model, f"{self.config.model}:latest"}
+        digest = ""
+        try:
+            response = _requests().get(f"{self.base_url}/api/tags", timeout=self._timeouts())
+            response.raise_for_status()
+            for model in response.json().get("models", []):
+                if names & {model.get("name"), model.get("model")}:
+                    digest = model.get("digest") or ""
+                    break
+        except Exception:
+            pass  # z.B. OpenAI-kompatibler Server ohne /api/tags
+        self._digest = (time.monotonic(), digest)
+        return digest
+
+    def reload_tuned_options(self):
+        """Liest das Autotune-Profil beim nächsten Request neu."""
+        self._tuned = None
+
+    def _runtime_options(self) -> Dict[str, Any]:
+        """Autotune-Profil für (Host, Modell), überschrieben von config.runtime_options."""
+        if self._tuned is None:
+            self._tuned = (load_tuned_options(self.base_url, self.config.model)
+                           if self.config.use_tuned_options else {})
+        return dict(self._tuned, **self.config.runtime_options)
+
+    def _options(self) -> Dict[str, Any]:
+        """Laufzeit-Optionen für /api/chat und /api/generate."""
+        options = self._runtime_options()
+        options["temperature"] = self.config.temperature
+        options["num_predict"] = self.config.max_tokens
+        if self.config.seed is not None:
+            options["seed"] = self.config.seed
+        return options
+
+    def add_stats_listener(self, listener: Callable[[Dict[str, float]], None]):
+        """Ruft listener(stats) nach jeder Ollama-Antwort mit Laufzeit-Statistik auf."""
+        self._stats_listeners.append(listener)
+
+    def remove_stats_listener(self, listener: Callable[[Dict[str, float]], None]):
+        """Entfernt einen mit add_stats_listener registrierten Listener."""
+        self._stats_listeners.remove(listener)
+
+    def _record_stats(self, data: Dict[str, Any]):
+        """
+        Übernimmt die Statistik einer nativen Ollama-Antwort (/api/chat, /api/generate).
+
+        Ollama liefert Dauern in Nanosekunden. Time-to-first-token entspricht
+        serverseitig Ladezeit + Prompt-Auswertung.
+        """
+        if "eval_count" not in data:
+            return
+        ns = 1e9
+        stats = {
+            "load_seconds": data.get("load_duration", 0) / ns,
+            "prompt_tokens": data.get("prompt_eval_count", 0),
+            "prompt_seconds": data.get("prompt_eval_duration", 0) / ns,
+            "eval_tokens": data.get("eval_count", 0),
+            "eval_seconds": data.get("eval_duration", 0) / ns,
+            "total_seconds": data.get("total_duration", 0) / ns,
+        }
+        stats["ttft_seconds"] = stats["load_seconds"] + stats["prompt_seconds"]
+        stats["tokens_per_second"] = (
+            stats["eval_tokens"] / stats["eval_seconds"] if stats["eval_seconds"] else 0.0
+        )
+        self.last_stats = stats
+
+        self.metrics.observe("model.ttft_seconds", stats["ttft_seconds"])
+        self.metrics.observe("model.tokens_per_second", stats["tokens_per_second"])
+        self.metrics.incr("model.prompt_tokens", stats["prompt_tokens"])
+        self.metrics.incr("model.eval_tokens", stats["eval_tokens"])
+        for listener in self._stats_listeners:
+            listener(stats)
+
+    # -------------------------------------------------------------------------
+    # /api/generate - Prompt-Aufbau, Kontext-Wiederverwendung, Tool-Emulation
+    # -------------------------------------------------------------------------
+
+    TOOL_CALL_INSTRUCTIONS = (
+        "Um ein Tool aufzurufen, antworte mit einem oder mehreren Blöcken der Form\n"
+        "<tool_call>{\"name\": \"TOOLNAME\", \"arguments\": {...}}</tool_call>\n"
+        "und warte auf das Tool-Ergebnis. Verfügbare Tools (JSON-Schema):"
+    )
+
+    @staticmethod
+    def _render_message(msg: Dict) -> str:
+        """Eine Nachricht als Prompt-Text (inkl. Tool-Calls und Tool-Ergebnissen)."""
+        role = msg.get("role", "user")
+        content = msg.get("content", "")
+        if role == "system":
+            return f"System: {content}"
+        if role == "tool":
+            return f"Tool-Ergebnis: {content}"
+        if role == "assistant":
+            calls = [
+                "<tool_call>" + json.dumps({
+                    "name": tc.get("function", {}).get("name", ""),
+                    "arguments": tc.get("function", {}).get("arguments", {})
+                }, ensure_ascii=False) + "</tool_call>"
+                for tc in msg.get("tool_calls") or []
+            ]
+            return "\n".join([f"Assistant: {content}"] + calls)
+        return f"User: {content}"
+
+    def _tool_prompt(self, tools: List[Dict]) -> str:
+        """Tool-Beschreibung für Modelle ohne natives Tool-Calling."""
+        schemas = [s["function"] for s in tools]
+        return "System: " + self.TOOL_CALL_INSTRUCTIONS + "\n" + "\n".join(
+            json.dumps(schema, ensure_ascii=False) for schema in schemas
+        )
+
+    def _build_prompt_from_messages(self, messages: List[Dict], tools: Optional[List[Dict]] = None) -> str:
+        """Konvertiert Messages zu einem einzelnen Prompt für /api/generate."""
+        parts = [self._render_message(msg) for msg in messages]
+        if tools:
+            # Nach dem System-Prompt, damit der Anfang des Verlaufs stabil bleibt
+            parts.insert(1 if messages and messages[0].get("role") == "system" else 0,
+                         self._tool_prompt(tools))
+        parts.append("Assistant:")
+        return "\n\n".join(parts)
+
+    def _fingerprint(self, messages: List[Dict]) -> str:
+        """Fingerprint eines Verlaufs (erkennt geänderte oder ersetzte Nachrichten)."""
+        import hashlib
+
+        digest = hashlib.sha1()
+        for msg in messages:
+            digest.update(self._render_message(msg).encode("utf-8", "replace"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _reset_generate_context(self):
+        """Verwirft den gespeicherten /api/generate-Kontext (nächster Aufruf baut neu auf)."""
+        self._gen_context = None
+        self._gen_covered = 0
+        self._gen_fingerprint = ""
+        self._gen_tools = set()
+
+    def _generate_delta(self, messages: List[Dict], tools: List[Dict]) -> Optional[str]:
+        """
+        Prompt nur mit den neuen Nachrichten, wenn der gespeicherte Kontext
+        noch zum Verlauf passt - sonst None (vollständiger Neuaufbau).
+        Neu ausgewählte Tools werden vor den neuen Nachrichten nachgereicht.
+        """
+        covered = self._gen_covered
+        if (self._gen_context is None or len(messages) <= covered
+                or self._fingerprint(messages[:covered]) != self._gen_fingerprint):
+            return None
+        parts = [self._render_message(msg) for msg in messages[covered:]]
+        added = [t for t in tools if t["function"]["name"] not in self._gen_tools]
+        if added:
+            parts.insert(0, self._tool_prompt(added))
+        parts.append("Assistant:")
+        return "\n\n".join(parts)
+
+    def _try_request(self, endpoint: str, payload: Dict, headers: Dict) -> Optional[Any]:
+        """Versucht einen Request an einen Endpunkt."""
+        try:
+            requests = _requests()
+            url = f"{self.base_url}{endpoint}"
+            response = requests.post(url, json=payload, headers=headers, timeout=self._timeouts())
+            if response.status_code in (200, 201):
+                return response
+        except Exception:
+            pass
+        return None
+
+    def _timeouts(self) -> tuple:
+        """(connect, read) Timeout für requests."""
+        return (self.config.connect_timeout, self.config.timeout)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        """Transiente Fehler, bei denen eine Wiederholung sinnvoll ist."""
+        requests = _requests()
+        if isinstance(error, requests.exceptions.HTTPError):
+            response = error.response
+            return response is not None and response.status_code in self.RETRY_STATUS
+        # ConnectTimeout ist auch ein ConnectionError; ReadTimeout (hängender Server) nicht
+        return isinstance(error, (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.ChunkedEncodingError
+        ))
+
+    # -------------------------------------------------------------------------
+    # Abbruch
+    # -------------------------------------------------------------------------
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """
+        Bricht laufende Anfragen ab (thread-safe).
+
+        Schließt die Verbindung der laufenden Streams - Ollama bemerkt den
+        Abbruch und gibt den Slot frei, statt bis num_predict weiterzurechnen.
+        """
+        self._cancel.set()
+        with self._active_lock:
+            responses = list(self._active)
+        for response in responses:
+            self._abort(response)
+
+    def reset_cancel(self):
+        """Setzt den Abbruch-Status zurück (vor einer neuen Anfrage)."""
+        self._cancel.clear()
+
+    def _stopped(self) -> bool:
+        """True bei Abbruch der Anfrage oder wenn dieser Hedge-Versuch verloren hat."""
+        stop = _hedge_stop.get()
+        return self._cancel.is_set() or (stop is not None and stop.is_set())
+
+    @staticmethod
+    def _abort(response):
+        """Schließt die Verbindung hart - auch wenn ein anderer Thread gerade liest."""
+        import socket
+
+        connection = getattr(response.raw, "_connection", None)
+        sock = getattr(connection, "sock", None)
+        try:
+            if sock is not None:
+                # shutdown weckt ein blockierendes recv() sofort auf, close() allein nicht
+                sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            response.close()
+        except Exception:
+            pass
+
+    def _read_stream(self, response) -> Dict[str, Any]:
+        """
+        Liest eine NDJSON-Antwort (stream=true) und setzt sie zur Form der
+        nicht-gestreamten Antwort zusammen (message bzw. response + Statistik).
+        """
+        parts: List[str] = []
+        tool_calls: List[Dict] = []
+        final: Dict[str, Any] = {}
+
+        try:
+            for line in response.iter_lines():
+                if self._stopped():
+                    raise CancelledError("Anfrage abgebrochen")
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                message = chunk.get("message") or {}
+                parts.append(message.get("content") or chunk.get("response") or "")
+                tool_calls.extend(message.get("tool_calls") or [])
+                if chunk.get("done"):
+                    final = chunk
+                    break
+        except CancelledError:
+            raise
+        except Exception:
+            if self._stopped():
+                raise CancelledError("Anfrage abgebrochen") from None
+            raise
+
+        if not final:
+            raise RuntimeError("Antwort-Stream unvollständig")
+        if "message" in final:
+            final["message"] = {"role": "assistant", "content": "".join(parts), "tool_calls": tool_calls}
+        else:
+            final["response"] = "".join(parts)
+        return final
+
+    def _post_once(self, host: str, endpoint: str, payload: Dict, headers: Dict) -> Dict[str, Any]:
+        """Ein einzelner POST, gibt die JSON-Antwort zurück (gestreamt wenn stream=true)."""
+        requests = _requests()
+        if self._stopped():
+            raise CancelledError("Anfrage abgebrochen")
+
+        stream = bool(payload.get("stream"))
+        response = requests.post(
+            f"{host}{endpoint}",
+            json=payload,
+            headers=headers,
+            timeout=self._timeouts(),
+            stream=stream
+        )
+        if not stream:
+            response.raise_for_status()
+            return response.json()
+
+        with self._active_lock:
+            self._active[response] = _hedge_stop.get()
+        try:
+            if self._stopped():
+                # Abbruch kam, während auf die ersten Bytes gewartet wurde
+                raise CancelledError("Anfrage abgebrochen")
+            response.raise_for_status()
+            return self._read_stream(response)
+        finally:
+            with self._active_lock:
+                self._active.pop(response, None)
+            if self._stopped():
+                self._abort(response)
+            else:
+                response.close()
+
+    def _post_with_retries(self, host: str, endpoint: str, payload: Dict, headers: Dict) -> Dict[str, Any]:
+        """POST mit Circuit Breaker und Wiederholung (exponentieller Backoff, Full Jitter)."""
+        import random
+
+        breaker = self._breakers[host]
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(
+                    f"Ollama ({host}) vorübergehend deaktiviert nach wiederholten Fehlern - "
+                    f"nächster Versuch in {breaker.retry_in():.0f}s"
+                )
+            try:
+                data = self._post_once(host, endpoint, payload, headers)
+            except CancelledError:
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                if self._stopped():
+                    breaker.release_probe()
+                    raise CancelledError("Anfrage abgebrochen") from None
+                retryable = self._is_retryable(e)
+                if retryable or isinstance(e, _requests().exceptions.Timeout):
+                    breaker.record_failure()
+                else:
+                    # Server antwortet (z.B. 4xx) - Host ist gesund
+                    breaker.record_success()
+                if not retryable or attempt >= self.config.max_retries:
+                    raise
+                time.sleep(random.uniform(0, self.config.retry_backoff * (2 ** attempt)))
+                attempt += 1
+                continue
+            except BaseException:
+                breaker.release_probe()  # Ctrl+C o.ä. - Host sonst bis zum Neustart gesperrt
+                raise
+
+            breaker.record_success()
+            return data
+
+    def _post_hedged(self, endpoint: str, payload: Dict, headers: Dict) -> Dict[str, Any]:
+        """
+        Sendet an den ersten gesunden Host und nach hedge_after Sekunden
+        zusätzlich an den nächsten. Die erste erfolgreiche Antwort gewinnt.
+        """
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-    def _try_request(self, endpoint: str, payload: Dict, headers: Dict) -> Optional[Any]:
-        """Versucht einen Request an einen Endpunkt."""
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(
+                max_workers=len(self.hosts) * 2, thread_name_prefix="polylog-hedge"
+            )
+
+        hosts = [h for h in self.hosts if self._breakers[h].state != "open"] or self.hosts[:1]
+        pending = set()
+        stops: Dict[Any, threading.Event] = {}
+        errors: List[Exception] = []
+
+        for index, host in enumerate(hosts):
+            stop = threading.Event()
+            future = self._hedge_pool.submit(self._hedge_attempt, stop, host, endpoint, payload, headers)
+            stops[future] = stop
+            pending.add(future)
+            # Letzter Host: ohne Limit auf das Ergebnis warten
+            timeout = self.config.hedge_after if index < len(hosts) - 1 else None
+            while pending:
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    break  # Hedge-Zeit abgelaufen → nächsten Host dazunehmen
+                for future in done:
+                    if future.exception() is None:
+                        # Verlierer abbrechen - sonst rechnen sie außerhalb des Scheduler-Slots weiter
+                        self._stop_hedges([stops[f] for f in pending])
+                        return future.result()
+                    errors.append(future.exception())
+                if timeout is not None and not pending:
+                    break  # Fehlschlag vor Ablauf → sofort nächsten Host versuchen
+
+        raise errors[-1] if errors else RuntimeError("Keine Antwort von Ollama")
+
+    def _hedge_attempt(self, stop: threading.Event, host: str, endpoint: str,
+                       payload: Dict, headers: Dict) -> Dict[str, Any]:
+        """Ein Hedge-Versuch an host; endet mit CancelledError, sobald stop gesetzt ist."""
+        token = _hedge_stop.set(stop)
         try:
-            url = f"{self.base_url}{endpoint}"
-            response = requests.post(url, json=payload, headers=headers, timeout=self.config.timeout)
-            if response.status_code in (200, 201):
-                return response
-        except Exception:
-            pass
-        return None
+            return self._post_with_retries(host, endpoint, payload, headers)
+        finally:
+            _hedge_stop.reset(token)
+
+    def _stop_hedges(self, stops: List[threading.Event]):
+        """Bricht die Hedge-Versuche zu stops ab und schließt ihre laufenden Streams."""
+        for stop in stops:
+            stop.set()
+        with self._active_lock:
+            responses = [r for r, s in self._active.items() if s is not None and s.is_set()]
+        for response in responses:
+            self._abort(response)
+
+    def _post_json(self, endpoint: str, payload: Dict, headers: Dict) -> Dict[str, Any]:
+        """POST an Ollama - mit Hedging wenn mehrere Hosts konfiguriert sind."""
+        if self.config.hedge_after is not None and len(self.hosts) > 1:
+            return self._post_hedged(endpoint, payload, headers)
+        return self._post_with_retries(self.base_url, endpoint, payload, headers)
 
     def _discover_endpoints(self):
         """Erkennt verfügbare API-Endpunkte."""
         if self._working_chat_endpoint or self._working_generate_endpoint:
             return
 
+        with self._discovery_lock:
+            if self._working_chat_endpoint or self._working_generate_endpoint:
+                return
+            self._probe_endpoints()
+
+    def _probe_endpoints(self):
+        """Testet die Endpunkte der Reihe nach mit Minimal-Anfragen."""
         headers = {"Content-Type": "application/json", "Accept": "application/json"}
 
         for endpoint in self.CHAT_ENDPOINTS:
@@ -392,7 +3327,7 @@ class OllamaClient:
                     "model": self.config.model,
                     "messages": [{"role": "user", "content": "test"}],
                     "stream": False,
-                    "options": {"num_predict": 1}
+                    "options": dict(self._runtime_options(), num_predict=1)
                 }
 
             resp = self._try_request(endpoint, test_payload, headers)
@@ -406,13 +3341,55 @@ class OllamaClient:
                 "model": self.config.model,
                 "prompt": "test",
                 "stream": False,
-                "options": {"num_predict": 1}
+                "options": dict(self._runtime_options(), num_predict=1)
             }
             resp = self._try_request(endpoint, test_payload, headers)
             if resp:
                 self._working_generate_endpoint = endpoint
                 return
 
+    def preload(self) -> bool:
+        """
+        Lädt das Modell in den Speicher, ohne eine Antwort zu generieren.
+
+        Ollama lädt das Modell bei leerer Nachrichtenliste (/api/chat) bzw.
+        fehlendem Prompt (/api/generate) und hält es für keep_alive im Speicher.
+        Ein erfolgreicher Preload ersetzt gleichzeitig die Endpunkt-Erkennung.
+        """
+        if not REQUESTS_AVAILABLE:
+            return False
+
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        payload = {"model": self.config.model, "messages": [], "keep_alive": self.config.keep_alive}
+        # Mit denselben Optionen laden wie später - num_ctx/num_gpu-Wechsel erzwingen sonst Neuladen
+        options = self._runtime_options()
+        if options:
+            payload["options"] = options
+
+        with self._discovery_lock:
+            if self._working_chat_endpoint in (None, "/api/chat") and not self._working_generate_endpoint:
+                if self._try_request("/api/chat", payload, headers):
+                    self._working_chat_endpoint = "/api/chat"
+                    self._use_openai_format = False
+                    return True
+
+            if self._working_generate_endpoint:
+                payload = {"model": self.config.model, "keep_alive": self.config.keep_alive}
+                if options:
+                    payload["options"] = options
+                return self._try_request(self._working_generate_endpoint, payload, headers) is not None
+
+            # Kein nativer Chat-Endpunkt: normale Erkennung (lädt das Modell ebenfalls)
+            if not self._working_chat_endpoint:
+                self._probe_endpoints()
+            return bool(self._working_chat_endpoint or self._working_generate_endpoint)
+
+    def preload_async(self) -> threading.Thread:
+        """Startet preload() im Hintergrund (z.B. während der User tippt)."""
+        thread = threading.Thread(target=self.preload, name="polylog-preload", daemon=True)
+        thread.start()
+        return thread
+
     def chat(self, messages: List[Dict], use_tools: bool = True) -> Dict[str, Any]:
         """Sendet Chat-Anfrage mit optionalem Tool-Calling."""
         if not REQUESTS_AVAILABLE:
@@ -421,11 +3398,37 @@ class OllamaClient:
         headers = {"Content-Type": "application/json", "Accept": "application/json"}
         self._discover_endpoints()
 
-        if self._working_chat_endpoint:
-            return self._chat_via_endpoint(messages, headers, use_tools)
+        if self._working_chat_endpoint or self._working_generate_endpoint:
+            tools = self.select_tools(messages)
+
+            # Deterministische Anfrage schon einmal beantwortet → ohne Inferenz zurück
+            cache_key = None
+            if self.response_cache is not None and self.deterministic:
+                cache_key = self._cache_key(messages, tools if use_tools else [])
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    # Antwort kam nicht vom Server - sein /api/generate-Kontext kennt sie nicht
+                    self._reset_generate_context()
+                    return cached
+
+            if use_tools:
+                self._record_tool_savings(tools)
 
-        if self._working_generate_endpoint:
-            return self._chat_via_generate(messages, headers)
+            # Wartezeit in der Queue getrennt von der Inferenzzeit erfassen
+            with self.scheduler.slot(self.session_id, self.config.priority) as waited:
+                self.metrics.observe("queue.wait_seconds", waited)
+                started = time.monotonic()
+                try:
+                    if self._working_chat_endpoint:
+                        result = self._chat_via_endpoint(messages, headers, tools if use_tools else [])
+                    else:
+                        result = self._chat_via_generate(messages, headers, use_tools, tools)
+                finally:
+                    self.metrics.observe("inference.seconds", time.monotonic() - started)
+
+            if cache_key is not None:
+                self.response_cache.put(cache_key, result)
+            return result
 
         raise RuntimeError(
             f"Kein funktionierender Ollama-Endpunkt gefunden.\n"
@@ -435,8 +3438,39 @@ class OllamaClient:
             f"  3. Ist der Host korrekt? ({self.base_url})"
         )
 
-    def _chat_via_endpoint(self, messages: List[Dict], headers: Dict, use_tools: bool) -> Dict[str, Any]:
-        """Chat über den erkannten Endpunkt."""
+    @property
+    def excluded_groups(self) -> tuple:
+        """Tool-Gruppen, die das Modell nie sieht (run_command nur mit allow_commands)."""
+        return () if self.config.allow_commands else ("befehle",)
+
+    def select_tools(self, messages: List[Dict]) -> List[Dict]:
+        """Tool-Schemas für diesen Verlauf."""
+        return ToolRegistry.select_schemas(messages, exclude_groups=self.excluded_groups)
+
+    def _record_tool_savings(self, tools: List[Dict]):
+        """Metrik: gegenüber allen erlaubten Schemas eingesparte Prompt-Tokens (1 Token ≈ 4 Zeichen)."""
+        all_chars = len(json.dumps(ToolRegistry.get_schemas(self.excluded_groups), ensure_ascii=False))
+        sent_chars = len(json.dumps(tools, ensure_ascii=False))
+        self.metrics.observe("tools.tokens_saved", (all_chars - sent_chars) / 4)
+
+    def _cache_key(self, messages: List[Dict], tools: List[Dict]) -> str:
+        """Schlüssel für den Antwort-Cache: alles, was die Antwort bestimmt."""
+        if self._working_chat_endpoint:
+            api = "openai" if self._use_openai_format else "chat"
+        else:
+            api = "generate"
+        return ResponseCache.key({
+            "model": self.config.model,
+            "digest": self.model_digest(),
+            "api": api,
+            "options": self._options(),
+            "messages": messages,
+            "tools": tools,
+        })
+
+    def _chat_via_endpoint(self, messages: List[Dict], headers: Dict, tools: List[Dict]) -> Dict[str, Any]:
+        """Chat über den erkannten Endpunkt (tools leer = ohne Tool-Calling)."""
+        requests = _requests()
         endpoint = self._working_chat_endpoint
 
         if self._use_openai_format:
@@ -446,44 +3480,41 @@ class OllamaClient:
                 "max_tokens": self.config.max_tokens,
                 "temperature": self.config.temperature
             }
-            if use_tools and ToolRegistry.get_schemas():
-                payload["tools"] = ToolRegistry.get_schemas()
+            if self.config.seed is not None:
+                payload["seed"] = self.config.seed
+            if tools:
+                payload["tools"] = tools
         else:
             payload = {
                 "model": self.config.model,
                 "messages": messages,
-                "stream": False,
-                "options": {
-                    "temperature": self.config.temperature,
-                    "num_predict": self.config.max_tokens
-                }
+                # Gestreamt, damit ein Abbruch die Generierung am Server beendet
+                "stream": True,
+                "keep_alive": self.config.keep_alive,
+                "options": self._options()
             }
-            if use_tools:
-                payload["tools"] = ToolRegistry.get_schemas()
+            if tools:
+                payload["tools"] = tools
 
         try:
-            response = requests.post(
-                f"{self.base_url}{endpoint}",
-                json=payload,
-                headers=headers,
-                timeout=self.config.timeout
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = self._post_json(endpoint, payload, headers)
 
             if self._use_openai_format:
-                choice = data.get("choices", [{}])[0]
-                message = choice.get("message", {})
-                return {
-                    "content": message.get("content", ""),
-                    "tool_calls": message.get("tool_calls", [])
-                }
+                message = data.get("choices", [{}])[0].get("message", {})
             else:
+                self._record_stats(data)
                 message = data.get("message", {})
-                return {
-                    "content": message.get("content", ""),
-                    "tool_calls": message.get("tool_calls", [])
-                }
+            content = message.get("content") or ""
+            tool_calls = message.get("tool_calls") or []
+
+            if tools and not tool_calls and content:
+                # Tool-Call als Text statt als tool_calls → trotzdem ausführen
+                content, tool_calls, _ = parse_text_tool_calls(content)
+                if tool_calls:
+                    self.metrics.incr("tool_calls.recovered")  # = eine gesparte Nachfrage-Runde
+            return {"content": content, "tool_calls": tool_calls}
+        except (CircuitOpenError, CancelledError):
+            raise
         except requests.exceptions.ConnectionError:
             raise RuntimeError(f"Ollama nicht erreichbar ({self.base_url})")
         except requests.exceptions.HTTPError as e:
@@ -492,43 +3523,84 @@ class OllamaClient:
         except Exception as e:
             raise RuntimeError(f"Ollama Fehler: {e}")
 
-    def _chat_via_generate(self, messages: List[Dict], headers: Dict) -> Dict[str, Any]:
-        """Fallback: Nutzt /api/generate statt /api/chat."""
-        prompt = self._build_prompt_from_messages(messages)
+    def _chat_via_generate(self, messages: List[Dict], headers: Dict,
+                           use_tools: bool = True, tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """
+        Fallback: Nutzt /api/generate statt /api/chat.
+
+        Ollama gibt mit jeder Antwort den Kontext (Token-IDs) zurück. Passt der
+        Verlauf noch dazu, werden nur die neuen Nachrichten gesendet und der
+        Server muss den bisherigen Verlauf nicht erneut auswerten. Tool-Calling
+        wird über <tool_call>-Blöcke im Prompt emuliert.
+        """
+        requests = _requests()
         endpoint = self._working_generate_endpoint or "/api/generate"
 
         payload = {
             "model": self.config.model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": self.config.temperature,
-                "num_predict": self.config.max_tokens
-            }
+            "stream": True,
+            "keep_alive": self.config.keep_alive,
+            "options": self._options()
         }
 
+        tools = tools or []
+        delta = self._generate_delta(messages, tools)
         try:
-            response = requests.post(
-                f"{self.base_url}{endpoint}",
-                json=payload,
-                headers=headers,
-                timeout=self.config.timeout
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            return {
-                "content": data.get("response", ""),
-                "tool_calls": []
-            }
+            data = None
+            if delta is not None:
+                try:
+                    data = self._post_json(endpoint, dict(payload, prompt=delta, context=self._gen_context),
+                                           headers)
+                    self.metrics.incr("generate.context_reused")
+                except requests.exceptions.HTTPError as e:
+                    # Kontext vom Server abgelehnt (z.B. Modell neu geladen) → neu aufbauen.
+                    # Timeouts, Verbindungsfehler und Überlast (502-504) nicht: ein Neuaufbau
+                    # würde den ganzen Verlauf an einen Server schicken, der schon nicht antwortet.
+                    if e.response is not None and e.response.status_code in self.RETRY_STATUS:
+                        raise
+                    self.metrics.incr("generate.context_rejected")
+                    data = None
+
+            if data is None:
+                self._reset_generate_context()
+                prompt = self._build_prompt_from_messages(messages, tools)
+                data = self._post_json(endpoint, dict(payload, prompt=prompt), headers)
+                self.metrics.incr("generate.full_rebuild")
+        except (CircuitOpenError, CancelledError):
+            raise
         except requests.exceptions.ConnectionError:
+            self._reset_generate_context()
             raise RuntimeError(f"Ollama nicht erreichbar ({self.base_url})")
         except Exception as e:
+            self._reset_generate_context()
             raise RuntimeError(f"Ollama Fehler: {e}")
 
+        self._record_stats(data)
+        content, tool_calls = data.get("response", ""), []
+        if use_tools:
+            content, tool_calls, formats = parse_text_tool_calls(content)
+            if any(fmt != "tool_call" for fmt in formats):
+                # Modell hat ein anderes als das angeleitete Format benutzt
+                self.metrics.incr("tool_calls.recovered")  # = eine gesparte Nachfrage-Runde
+
+        # Kontext deckt jetzt den gesendeten Verlauf plus diese Antwort ab
+        reply = {"role": "assistant", "content": content}
+        if tool_calls:
+            reply["tool_calls"] = tool_calls
+        if data.get("context"):
+            self._gen_context = data["context"]
+            self._gen_covered = len(messages) + 1
+            self._gen_fingerprint = self._fingerprint(list(messages) + [reply])
+            self._gen_tools |= {t["function"]["name"] for t in tools}
+        else:
+            self._reset_generate_context()
+
+        return {"content": content, "tool_calls": tool_calls}
+
     def is_available(self) -> bool:
         """Prüft Ollama-Verbindung."""
         try:
+            requests = _requests()
             for endpoint in ["/api/tags", "/v1/models", "/api/version"]:
                 try:
                     r = requests.get(
@@ -550,59 +3622,645 @@ class OllamaClient:
 # =============================================================================
 
 class PromptRegistry:
-    """Registry für Bootblock-Prompt."""
+    """Registry für Bootblock-Prompt (gecacht pro Working Directory)."""
 
-    _bootblock: Optional[str] = None
-    _bootblock_loaded: bool = False
+    _bootblocks: Dict[Path, Optional[str]] = {}
+    _lock = threading.Lock()
 
     @classmethod
-    def get_bootblock(cls) -> Optional[str]:
-        """Lädt den Bootblock aus bootblock.md."""
-        if cls._bootblock_loaded:
-            return cls._bootblock
+    def get_bootblock(cls, working_dir: Optional[Path] = None) -> Optional[str]:
+        """Lädt den Bootblock aus bootblock.md (Projekt vor Modulverzeichnis)."""
+        working_dir = Path(working_dir) if working_dir else get_config().working_dir
+        with cls._lock:
+            if working_dir in cls._bootblocks:
+                return cls._bootblocks[working_dir]
+
+            bootblock = None
+            search_paths = [
+                working_dir / "bootblock.md",
+                Path(__file__).parent / "bootblock.md",
+            ]
+
+            for path in search_paths:
+                if path.exists():
+                    try:
+                        bootblock = path.read_text(encoding='utf-8')
+                        break
+                    except Exception:
+                        pass
 
-        cls._bootblock_loaded = True
+            cls._bootblocks[working_dir] = bootblock
+            return bootblock
 
-        search_paths = [
-            _config.working_dir / "bootblock.md",
-            Path(__file__).parent / "bootblock.md",
-        ]
+    @classmethod
+    def has_bootblock(cls, working_dir: Optional[Path] = None) -> bool:
+        """Prüft ob ein Bootblock verfügbar ist."""
+        return cls.get_bootblock(working_dir) is not None
 
-        for path in search_paths:
-            if path.exists():
-                try:
-                    cls._bootblock = path.read_text(encoding='utf-8')
-                    return cls._bootblock
-                except Exception:
-                    pass
 
+# =============================================================================
+# Autotune - Laufzeit-Optionen (num_ctx, num_batch, num_thread, num_gpu) pro Host und Modell
+# =============================================================================
+
+# Typischer Tool-Loop-Turn, für den optimiert wird: viel Prompt, wenig Ausgabe
+TUNE_PROMPT_TOKENS = 2000
+TUNE_EVAL_TOKENS = 300
+TUNE_NUM_PREDICT = 64
+
+TUNE_PROMPT = (
+    "Fasse die folgende Funktion in zwei Sätzen zusammen und nenne mögliche Fehlerquellen.\n\n"
+    + "\n".join(
+        f"def schritt_{i}(daten, grenze={i}):\n"
+        f"    ergebnis = [x * {i} for x in daten if x > grenze]\n"
+        f"    return sum(ergebnis) / max(len(ergebnis), 1)\n"
+        for i in range(40)
+    )
+)
+
+
+def tuning_file() -> Path:
+    """Ablage der Profile (XDG_CONFIG_HOME/polylog/autotune.json)."""
+    base = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    return Path(base) / "polylog" / "autotune.json"
+
+
+def _tuning_key(host: str, model: str) -> str:
+    return f"{host.rstrip('/')}|{model}"
+
+
+def load_tuned_options(host: str, model: str, path: Optional[Path] = None) -> Dict[str, Any]:
+    """Gespeichertes Profil für (host, model) - leer wenn nicht getunt."""
+    try:
+        profiles = json.loads((path or tuning_file()).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return dict(profiles.get(_tuning_key(host, model), {}).get("options", {}))
+
+
+def save_tuned_options(host: str, model: str, profile: Dict[str, Any], path: Optional[Path] = None):
+    """Speichert ein Profil (atomar, andere Einträge bleiben erhalten)."""
+    path = path or tuning_file()
+    try:
+        profiles = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        profiles = {}
+    profiles[_tuning_key(host, model)] = profile
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(profiles, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _hardware() -> Dict[str, Any]:
+    """CPU-Kerne und freier Arbeitsspeicher (ohne psutil)."""
+    logical = os.cpu_count() or 1
+    info = {"cpu_logical": logical, "cpu_physical": max(1, logical // 2), "mem_available": None}
+    try:
+        # Physische Kerne = verschiedene (physical id, core id)-Paare
+        cores = set()
+        physical = None
+        with open("/proc/cpuinfo", encoding="ascii", errors="ignore") as f:
+            for line in f:
+                if line.startswith("physical id"):
+                    physical = line.split(":")[1].strip()
+                elif line.startswith("core id"):
+                    cores.add((physical, line.split(":")[1].strip()))
+        if cores:
+            info["cpu_physical"] = len(cores)
+    except OSError:
+        pass
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    info["mem_available"] = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return info
+
+
+def _loaded_model_memory(client: "OllamaClient") -> Dict[str, int]:
+    """Speicherbedarf des geladenen Modells laut /api/ps (size / size_vram in Bytes)."""
+    requests = _requests()
+    try:
+        response = requests.get(f"{client.base_url}/api/ps", timeout=client._timeouts())
+        response.raise_for_status()
+        for model in response.json().get("models", []):
+            if client.config.model in (model.get("name"), model.get("model")):
+                return {"size": model.get("size", 0), "size_vram": model.get("size_vram", 0)}
+    except Exception:
+        pass
+    return {"size": 0, "size_vram": 0}
+
+
+def _tune_trial(client: "OllamaClient", options: Dict[str, Any], run: int) -> Optional[Dict[str, float]]:
+    """Ein Messlauf mit den Optionen. None wenn Ollama die Optionen ablehnt (z.B. zu wenig Speicher)."""
+    payload = {
+        "model": client.config.model,
+        # Eigene erste Zeile pro Lauf: verhindert, dass Ollama den Prompt aus dem KV-Cache nimmt
+        "prompt": f"Lauf {run}.\n" + TUNE_PROMPT,
+        "stream": False,
+        "keep_alive": client.config.keep_alive,
+        "options": dict(options, temperature=0, seed=1, num_predict=TUNE_NUM_PREDICT),
+    }
+    headers = {"Content-Type": "application/json", "Accept": "application/json"}
+    try:
+        data = client._post_json("/api/generate", payload, headers)
+    except (CircuitOpenError, CancelledError):
+        raise
+    except Exception:
+        return None
+
+    ns = 1e9
+    prompt_tps = data.get("prompt_eval_count", 0) / max(data.get("prompt_eval_duration", 0) / ns, 1e-9)
+    eval_tps = data.get("eval_count", 0) / max(data.get("eval_duration", 0) / ns, 1e-9)
+    if not prompt_tps or not eval_tps:
         return None
+    memory = _loaded_model_memory(client)
+    return {
+        "prompt_tokens_per_second": round(prompt_tps, 1),
+        "eval_tokens_per_second": round(eval_tps, 1),
+        # Geschätzte Dauer eines typischen Turns - das Optimierungsziel
+        "turn_seconds": round(TUNE_PROMPT_TOKENS / prompt_tps + TUNE_EVAL_TOKENS / eval_tps, 2),
+        "memory_bytes": memory["size"],
+        "vram_bytes": memory["size_vram"],
+    }
 
-    @classmethod
-    def has_bootblock(cls) -> bool:
-        """Prüft ob ein Bootblock verfügbar ist."""
-        return cls.get_bootblock() is not None
+
+def autotune(client: "OllamaClient", repeats: int = 2, save: bool = True,
+             echo: bool = True) -> Dict[str, Any]:
+    """
+    Sucht die schnellsten Laufzeit-Optionen für client.config.model auf dem Host.
+
+    Koordinatensuche statt vollem Gitter: num_thread, num_batch, num_ctx und
+    num_gpu werden nacheinander variiert, die übrigen bleiben beim bisher
+    besten Wert. Kandidaten richten sich nach der Hardware (Kerne, freier
+    Speicher, GPU laut /api/ps). Jeder Lauf wird repeats-mal gemessen, der
+    schnellste zählt. Das Ergebnis landet in tuning_file() und wird von
+    OllamaClient automatisch verwendet.
+
+    Returns:
+        Profil: options, measured, baseline, hardware, trials, tuned_at
+    """
+    hardware = _hardware()
+    say = print if echo else (lambda *a, **k: None)
+    run = 0
+
+    def measure(options: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        nonlocal run
+        # Erster Lauf lädt das Modell ggf. mit den neuen Optionen neu - nicht werten
+        run += 1
+        if _tune_trial(client, options, run) is None:
+            return None
+        best = None
+        for _ in range(repeats):
+            run += 1
+            result = _tune_trial(client, options, run)
+            if result is None:
+                return None
+            if best is None or result["turn_seconds"] < best["turn_seconds"]:
+                best = result
+        say(f"  {json.dumps(options, sort_keys=True):60s} "
+            f"Prompt {best['prompt_tokens_per_second']:8.1f} t/s  "
+            f"Ausgabe {best['eval_tokens_per_second']:6.1f} t/s  "
+            f"Turn {best['turn_seconds']:6.2f}s  "
+            f"{best['memory_bytes'] / 1024 ** 3:5.1f} GiB")
+        return best
+
+    say(f"Autotune {client.config.model} @ {client.base_url}")
+    say(f"  Hardware: {hardware['cpu_physical']} Kerne ({hardware['cpu_logical']} Threads), "
+        f"frei {(hardware['mem_available'] or 0) / 1024 ** 3:.1f} GiB")
+
+    trials: List[Dict[str, Any]] = []
+    best_options: Dict[str, Any] = {}
+    baseline = measure({})
+    if baseline is None:
+        raise RuntimeError(f"Modell {client.config.model} antwortet nicht auf {client.base_url}")
+    best = baseline
+    trials.append({"options": {}, "measured": baseline})
+    gpu = baseline["vram_bytes"] > 0
+
+    threads = sorted({hardware["cpu_physical"], hardware["cpu_logical"],
+                      max(1, hardware["cpu_physical"] - 1)})
+    ctx = [4096, 8192, 16384]
+    if hardware["mem_available"] and baseline["memory_bytes"]:
+        # Größerer Kontext braucht mehr KV-Cache - nur testen, wenn Speicher da ist
+        headroom = hardware["mem_available"] / baseline["memory_bytes"]
+        ctx = [c for c in ctx if c <= 8192 or headroom > 1.5]
+    # (Option, Kandidaten, Faktor): übernommen wird, was schneller als best * Faktor ist.
+    # 0.97 - Messrauschen soll keine Option "gewinnen" lassen. num_ctx: größer ist
+    # besser (der Tool-Loop-Verlauf wird sonst abgeschnitten), solange kaum langsamer.
+    sweeps = [
+        ("num_thread", threads, 0.97),
+        ("num_batch", [128, 256, 512, 1024], 0.97),
+        ("num_ctx", ctx, 1.05),
+        # GPU vorhanden: alle Layer auf die GPU vs. Ollamas Standard-Aufteilung
+        ("num_gpu", [999] if gpu else [0], 0.97),
+    ]
+
+    for name, candidates, factor in sweeps:
+        reference = best
+        for value in candidates:
+            options = dict(best_options, **{name: value})
+            result = measure(options)
+            trials.append({"options": options, "measured": result})
+            if result is not None and result["turn_seconds"] < reference["turn_seconds"] * factor:
+                best, best_options = result, options
+                if factor < 1:
+                    reference = result
+
+    profile = {
+        "options": best_options,
+        "measured": best,
+        "baseline": baseline,
+        "hardware": hardware,
+        "trials": trials,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    gain = 1 - best["turn_seconds"] / baseline["turn_seconds"]
+    say(f"\nBestes Profil: {json.dumps(best_options, sort_keys=True) or '{}'} "
+        f"({gain:.0%} schneller als Server-Standard)")
+    if save:
+        save_tuned_options(client.base_url, client.config.model, profile)
+        say(f"Gespeichert in {tuning_file()}")
+    client.reload_tuned_options()
+    return profile
+
+
+# =============================================================================
+# Profiling - CPU- und Speicherprofil pro Anfrage
+# =============================================================================
+
+class TurnProfiler:
+    """
+    Profiliert process()-Aufrufe: cProfile (CPU) und tracemalloc (Speicher).
+
+    Pro Anfrage entstehen im Profil-Verzeichnis:
+      turn-NNN.prof     pstats-Dump (z.B. für snakeviz oder python -m pstats)
+      turn-NNN.txt      Top-Funktionen nach kumulierter Zeit + Speicher-Diff
+
+    cProfile erfasst nur den aufrufenden Thread - Arbeit in Worker-Threads
+    (read_files, Hedging) erscheint als Wartezeit im Hauptthread.
+    """
+
+    def __init__(self, profile_dir: Path, top_n: int = 15, echo: bool = True):
+        self.profile_dir = Path(profile_dir)
+        self.top_n = top_n
+        self.echo = echo
+        self.turns = 0
+        self.last: Optional[Dict[str, Any]] = None
+
+    @contextmanager
+    def profile(self, label: str = ""):
+        """Profiliert den Block und schreibt das Ergebnis ins Profil-Verzeichnis."""
+        import cProfile
+        import tracemalloc
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield self
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self.turns += 1
+            self.last = self._write(profiler, before, after, elapsed, peak, label)
+            if self.echo:
+                print(self.last["summary"])
+
+    def _write(self, profiler, before, after, elapsed: float, peak: int, label: str) -> Dict[str, Any]:
+        """Schreibt .prof und .txt und gibt die Pfade plus Kurzfassung zurück."""
+        import io
+        import pstats
+        import tracemalloc
+
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        stem = self.profile_dir / f"turn-{self.turns:03d}"
+        prof_path = stem.with_suffix(".prof")
+        text_path = stem.with_suffix(".txt")
+        profiler.dump_stats(str(prof_path))
+
+        # Allokationen von tracemalloc/cProfile selbst ausblenden
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__),
+                  tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+        growth = [d for d in diff if d.size_diff > 0][:self.top_n]
+
+        cpu = io.StringIO()
+        stats = pstats.Stats(profiler, stream=cpu)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(self.top_n)
+
+        header = (f"[Profil] Anfrage {self.turns}{f' ({label})' if label else ''}: "
+                  f"{elapsed:.3f}s, {stats.total_calls} Aufrufe, "
+                  f"Speicher-Peak {peak / 1024:.0f} KiB")
+        memory = [f"  {d.size_diff / 1024:+9.1f} KiB  {d.count_diff:+6d}  {d.traceback[0]}"
+                  for d in growth]
+
+        text_path.write_text(
+            header + "\n\n=== CPU (kumuliert) ===\n" + cpu.getvalue()
+            + "\n=== Speicher-Zuwachs (Datei:Zeile) ===\n" + "\n".join(memory) + "\n",
+            encoding="utf-8"
+        )
+
+        # Kurzfassung: die teuersten Funktionen ohne pstats-Kopfzeilen
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        cpu_lines = [
+            f"  {cumtime:8.3f}s  {calls:7d}x  {pstats.func_std_string(func)}"
+            for func, (_, calls, _, cumtime, _) in top[:self.top_n]
+        ]
+        summary = "\n".join(
+            [header, "  CPU (kumuliert):"] + cpu_lines
+            + ["  Speicher-Zuwachs:"] + (memory or ["  (keiner)"])
+            + [f"  → {prof_path}"]
+        )
+
+        return {
+            "seconds": elapsed,
+            "peak_bytes": peak,
+            "prof": prof_path,
+            "report": text_path,
+            "summary": summary,
+        }
+
+
+# =============================================================================
+# Nachrichtenspeicher - kompakter Verlauf mit Auslagerung großer Inhalte
+# =============================================================================
+
+# Inhalte ab dieser Größe (Zeichen) landen im Blob-Speicher statt im Heap
+SPILL_THRESHOLD_CHARS = 2048
+# write_file-Inhalte ab dieser Größe werden im Verlauf durch eine Kurzfassung ersetzt
+ELIDE_WRITE_CHARS = 1024
+ELIDE_DIFF_LINES = 20
+
+
+class BlobRef:
+    """Verweis auf einen ausgelagerten Inhalt (Offset + Länge im Blob-Speicher)."""
+    __slots__ = ("offset", "length")
+
+    def __init__(self, offset: int, length: int):
+        self.offset = offset
+        self.length = length
+
+
+class BlobStore:
+    """
+    Append-only Blob-Speicher einer Session in einer anonymen Temp-Datei.
+
+    Die Datei ist bereits gelöscht (TemporaryFile) und verschwindet mit dem
+    Prozess. Gelesen wird erst beim Serialisieren einer Anfrage; was gerade
+    nicht gebraucht wird, liegt im Page Cache des Betriebssystems statt im
+    Python-Heap.
+    """
+
+    def __init__(self):
+        import tempfile
+
+        self._file = tempfile.TemporaryFile(prefix="polylog-blobs-")
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes) -> BlobRef:
+        with self._lock:
+            self._file.seek(self._size)
+            self._file.write(data)
+            ref = BlobRef(self._size, len(data))
+            self._size += len(data)
+        return ref
+
+    def get(self, ref: BlobRef) -> bytes:
+        with self._lock:
+            self._file.flush()
+            if hasattr(os, "pread"):
+                return os.pread(self._file.fileno(), ref.length, ref.offset)
+            self._file.seek(ref.offset)
+            return self._file.read(ref.length)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def clear(self):
+        with self._lock:
+            self._file.truncate(0)
+            self._size = 0
+
+
+class ToolCall:
+    """Ein Tool-Aufruf im Verlauf (Name interniert, Argumente als JSON-Text)."""
+    __slots__ = ("name", "arguments", "as_text", "extra", "original")
+
+    def __init__(self, name: str, arguments: Any, as_text: bool, extra: Optional[Dict],
+                 original: Optional[BlobRef] = None):
+        self.name = name
+        self.arguments = arguments  # JSON-Text oder BlobRef
+        self.as_text = as_text      # Argumente kamen als String (OpenAI-Format)
+        self.extra = extra          # z.B. id/type
+        self.original = original    # ursprüngliche Argumente, falls gekürzt
+
+
+class Message:
+    """Eine Nachricht im Verlauf (Rolle interniert, großer Inhalt ausgelagert)."""
+    __slots__ = ("role", "content", "tool_calls", "extra")
+
+    def __init__(self, role: str, content: Any, tool_calls: Optional[tuple], extra: Optional[Dict]):
+        self.role = role
+        self.content = content        # str oder BlobRef
+        self.tool_calls = tool_calls  # Tuple[ToolCall, ...] oder None
+        self.extra = extra            # sonstige Felder (selten)
+
+
+def elide_write_arguments(args: Dict[str, Any], previous: Optional[str]) -> Dict[str, Any]:
+    """
+    Kurzfassung von write_file-Argumenten für den Verlauf: Pfad, Bytes,
+    Hash und ein kurzer Diff gegen die vorherige Version (previous=None:
+    neue Datei bzw. Vorversion nicht lesbar).
+    """
+    import difflib
+    import hashlib
+
+    content = args.get("content", "")
+    data = content.encode("utf-8")
+    header = f"[Inhalt ausgelassen: {len(data)} Bytes, sha256 {hashlib.sha256(data).hexdigest()[:16]}"
+
+    if previous is None:
+        lines = [header + f", neue Datei mit {len(content.splitlines())} Zeilen]"]
+    else:
+        # Ohne ---/+++-Kopf, ohne Kontextzeilen - nur die Änderungen
+        diff = list(difflib.unified_diff(previous.splitlines(), content.splitlines(), lineterm="", n=0))[2:]
+        added = sum(1 for line in diff if line.startswith("+"))
+        removed = sum(1 for line in diff if line.startswith("-"))
+        lines = [header + (f", +{added}/-{removed} Zeilen gegenüber der Vorversion]" if diff
+                           else ", unverändert gegenüber der Vorversion]")]
+        lines += [line[:160] for line in diff[:ELIDE_DIFF_LINES]]
+        if len(diff) > ELIDE_DIFF_LINES:
+            lines.append(f"... {len(diff) - ELIDE_DIFF_LINES} weitere Diff-Zeilen")
+
+    # Eigener Schlüssel statt "content": das Modell soll keine Kurzfassung als Dateiinhalt nachahmen
+    return {"path": args.get("path", ""), "content_elided": "\n".join(lines)}
+
+
+class MessageStore:
+    """
+    Verlauf einer Session als kompakte Records statt Dicts.
+
+    Verhält sich nach außen wie eine Liste von Message-Dicts (append,
+    Iteration, Index, Slices). materialize() baut die Dicts für eine
+    Anfrage - nur für deren Dauer liegen ausgelagerte Inhalte im Speicher.
+    """
+
+    def __init__(self, messages: Optional[List[Dict]] = None,
+                 spill_threshold: int = SPILL_THRESHOLD_CHARS):
+        self.spill_threshold = spill_threshold
+        self.blobs = BlobStore()
+        self._records: List[Message] = []
+        for msg in messages or []:
+            self.append(msg)
+
+    # --- Kodierung ---------------------------------------------------------
+
+    def _pack(self, text: str) -> Any:
+        if len(text) >= self.spill_threshold:
+            return self.blobs.put(text.encode("utf-8"))
+        return text
+
+    def _unpack(self, value: Any) -> str:
+        if isinstance(value, BlobRef):
+            return self.blobs.get(value).decode("utf-8")
+        return value
+
+    def _pack_call(self, call: Dict) -> ToolCall:
+        func = call.get("function", {})
+        arguments = func.get("arguments", {})
+        as_text = isinstance(arguments, str)
+        text = arguments if as_text else json.dumps(arguments, ensure_ascii=False)
+        extra = {k: v for k, v in call.items() if k != "function"} or None
+        return ToolCall(sys.intern(func.get("name", "")), self._pack(text), as_text, extra)
+
+    def _unpack_call(self, call: ToolCall) -> Dict:
+        text = self._unpack(call.arguments)
+        out = dict(call.extra) if call.extra else {}
+        out["function"] = {"name": call.name, "arguments": text if call.as_text else json.loads(text)}
+        return out
+
+    def _to_dict(self, record: Message) -> Dict:
+        msg = {"role": record.role, "content": self._unpack(record.content)}
+        if record.tool_calls:
+            msg["tool_calls"] = [self._unpack_call(c) for c in record.tool_calls]
+        if record.extra:
+            msg.update(record.extra)
+        return msg
+
+    # --- Listen-Schnittstelle ----------------------------------------------
+
+    def append(self, msg: Dict):
+        calls = msg.get("tool_calls")
+        extra = {k: v for k, v in msg.items() if k not in ("role", "content", "tool_calls")}
+        self._records.append(Message(
+            sys.intern(msg.get("role", "user")),
+            self._pack(msg.get("content") or ""),
+            tuple(self._pack_call(c) for c in calls) if calls else None,
+            extra or None,
+        ))
+
+    def extend(self, messages: List[Dict]):
+        for msg in messages:
+            self.append(msg)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self):
+        return (self._to_dict(r) for r in self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._to_dict(r) for r in self._records[index]]
+        return self._to_dict(self._records[index])
+
+    def materialize(self) -> List[Dict]:
+        """Alle Nachrichten als Dicts (für die Serialisierung einer Anfrage)."""
+        return [self._to_dict(r) for r in self._records]
+
+    def replace_call_arguments(self, index: int, position: int, arguments: Dict):
+        """
+        Ersetzt die Argumente eines Tool-Calls (z.B. durch eine Kurzfassung).
+        Das Original bleibt im Blob-Speicher - siehe original_arguments().
+        """
+        call = self._records[index].tool_calls[position]
+        original = call.original
+        if original is None:
+            original = (call.arguments if isinstance(call.arguments, BlobRef)
+                        else self.blobs.put(call.arguments.encode("utf-8")))
+        text = json.dumps(arguments, ensure_ascii=False)
+        calls = list(self._records[index].tool_calls)
+        calls[position] = ToolCall(call.name, self._pack(text), call.as_text, call.extra, original)
+        self._records[index].tool_calls = tuple(calls)
+
+    def original_arguments(self, index: int, position: int) -> Any:
+        """Vollständige Argumente eines Tool-Calls, auch wenn sie im Verlauf gekürzt sind."""
+        call = self._records[index].tool_calls[position]
+        text = self._unpack(call.original if call.original is not None else call.arguments)
+        return text if call.as_text else json.loads(text)
+
+    def clear(self):
+        self._records.clear()
+        self.blobs.clear()
+
+    # --- Speicher ----------------------------------------------------------
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Geschätzter Heap-Verbrauch des Verlaufs und ausgelagerte Bytes."""
+        size = sys.getsizeof
+        resident = size(self._records)
+        spilled = 0
+        for r in self._records:
+            resident += size(r)
+            values = [r.content] + [c.arguments for c in r.tool_calls or ()]
+            for value in values:
+                resident += size(value)
+                spilled += isinstance(value, BlobRef)
+            if r.tool_calls:
+                resident += size(r.tool_calls) + sum(size(c) for c in r.tool_calls)
+        return {
+            "messages": len(self._records),
+            "resident_bytes": resident,
+            "spilled_blobs": spilled,
+            "spilled_bytes": self.blobs.size,
+        }
 
 
 # =============================================================================
 # Polylog Bridge - Hauptklasse
 # =============================================================================
 
-def get_system_prompt(working_dir: str, include_bootblock: bool = True) -> str:
-    """Generiert den System-Prompt."""
+def get_system_prompt(working_dir: str, include_bootblock: bool = True,
+                      exclude_groups: tuple = ()) -> str:
+    """Generiert den System-Prompt (ohne Tools aus exclude_groups)."""
     parts = []
 
     # Bootblock als Werte-Layer voranstellen
     if include_bootblock:
-        bootblock = PromptRegistry.get_bootblock()
+        bootblock = PromptRegistry.get_bootblock(Path(working_dir))
         if bootblock:
             parts.append("Die folgenden Werte haben HÖCHSTE PRIORITÄT bei allen Entscheidungen:\n")
             parts.append(bootblock)
 
     # Tool-Beschreibungen
     tools_desc = "\n".join(
-        f"- {name}: {t['schema']['function']['description']}"
-        for name, t in ToolRegistry._tools.items()
+        f"- {name}: {ToolRegistry.get_description(name)}"
+        for name in ToolRegistry.list_tools(exclude_groups)
     )
 
     standard_prompt = f"""=== POLYLOG CODING ASSISTANT ===
@@ -618,6 +4276,7 @@ REGELN:
 2. Lies ZUERST Dateien bevor du sie änderst
 3. Antworte kurz und präzise
 4. Bei Unsicherheit: fragen, nicht raten
+5. Vor write_file: git_status prüfen (Working Tree clean, HEAD unverändert)
 
 KONTEXT:
 - Arbeitsverzeichnis: {working_dir}
@@ -640,23 +4299,79 @@ class PolylogBridge:
     5. LLM gibt finale Antwort
     """
 
+    REPEAT_NUDGE = (
+        "Dieser Aufruf wurde mit identischen Argumenten bereits ausgeführt. "
+        "Das Ergebnis stammt aus dem Cache - nutze es, statt den Aufruf zu wiederholen."
+    )
+    FINAL_ANSWER_NUDGE = (
+        "[Bridge] Das Tool-Budget dieser Anfrage ist erschöpft. Gib jetzt ohne weitere "
+        "Tool-Aufrufe deine finale Antwort auf Basis der bisherigen Ergebnisse."
+    )
+    CANCELLED_REPLY = "[Abgebrochen]"
+
     def __init__(self, config: BridgeConfig = None):
         self.config = config or BridgeConfig()
-        self.client = OllamaClient(self.config)
-        self.messages: List[Dict] = []
+        self.metrics = BridgeMetrics()
+        self.client = OllamaClient(self.config, self.metrics)
+        # System-Prompt (inkl. Bootblock) wird erst beim ersten Zugriff gebaut
+        self._messages: Optional[MessageStore] = None
+
+        # Eigener Tool-Kontext pro Bridge (keine globale Config mehr)
+        self.tool_config = ToolConfig(
+            working_dir=Path(self.config.working_dir).resolve(),
+            allow_write=True,
+            read_cache=ReadCache(self.metrics),
+            allow_commands=self.config.allow_commands
+        )
+        self.snapshots: Optional[SnapshotStore] = None
+        if self.config.snapshots:
+            self.snapshots = SnapshotStore(self.tool_config.working_dir, self.client.session_id,
+                                           self.config.snapshot_max_bytes)
+            self.tool_config.snapshots = self.snapshots
+        if self.config.watch_files:
+            # Änderungen von Editor/git außerhalb der Bridge ohne Rescan mitbekommen
+            self.tool_config.watcher = get_watcher(self.tool_config.working_dir)
+            self.tool_config.read_cache.attach(self.tool_config.watcher)
+
+        self.profiler: Optional[TurnProfiler] = None
+        if self.config.profile_dir:
+            self.enable_profiling(self.config.profile_dir)
+
+    def enable_profiling(self, profile_dir: Path, top_n: int = 15, echo: bool = True) -> TurnProfiler:
+        """
+        Aktiviert Profiling für alle folgenden process()-Aufrufe.
 
-        set_config(ToolConfig(
-            working_dir=self.config.working_dir,
-            allow_write=True
-        ))
+        Das Ergebnis der letzten Anfrage steht in bridge.profiler.last
+        (Pfade, Dauer, Speicher-Peak, Kurzfassung).
+        """
+        self.profiler = TurnProfiler(profile_dir, top_n=top_n, echo=echo)
+        return self.profiler
 
-        self._init_messages()
+    def disable_profiling(self):
+        """Deaktiviert das Profiling."""
+        self.profiler = None
+
+    @property
+    def messages(self) -> MessageStore:
+        """Konversationsverlauf (initialisiert den System-Prompt bei Bedarf)."""
+        if self._messages is None:
+            self._init_messages()
+        return self._messages
+
+    @messages.setter
+    def messages(self, value: List[Dict]):
+        self._messages = value if isinstance(value, MessageStore) else MessageStore(value)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Speicherbedarf des Verlaufs dieser Session (Heap + ausgelagert)."""
+        return self.messages.memory_usage()
 
     def _init_messages(self):
         """Initialisiert die Nachrichten mit System-Prompt."""
         self.messages = [{
             "role": "system",
-            "content": get_system_prompt(str(self.config.working_dir))
+            "content": get_system_prompt(str(self.config.working_dir),
+                                         exclude_groups=self.client.excluded_groups)
         }]
 
     def process(self, user_input: str, verbose: bool = False) -> str:
@@ -668,16 +4383,74 @@ class PolylogBridge:
             verbose: Zeigt Tool-Calls an
 
         Returns:
-            Finale Antwort des LLM
+            Finale Antwort des LLM (bzw. CANCELLED_REPLY nach Ctrl+C / cancel())
         """
+        self.client.reset_cancel()
+        try:
+            if self.profiler is None:
+                return self._process(user_input, verbose)
+
+            with self.profiler.profile(user_input[:40]):
+                return self._process(user_input, verbose)
+        except (KeyboardInterrupt, CancelledError):
+            # Laufende Anfrage schließen - Ollama hört dann auf zu generieren
+            self.client.cancel()
+            self.metrics.incr("turn.cancelled")
+            # Verlauf bleibt erhalten; Platzhalter und Hinweis halten die Rollenfolge gültig
+            self._answer_open_tool_calls()
+            self.messages.append({"role": "assistant", "content": self.CANCELLED_REPLY})
+            return self.CANCELLED_REPLY
+
+    def cancel(self):
+        """Bricht die laufende Anfrage ab (thread-safe, z.B. aus einem UI-Thread)."""
+        self.client.cancel()
+
+    def _answer_open_tool_calls(self):
+        """
+        Beantwortet nach einem Abbruch die nicht mehr ausgeführten Tool-Calls
+        der letzten Assistant-Nachricht mit einem Platzhalter - sonst lehnen
+        Server (z.B. /v1) den Verlauf ab.
+        """
+        answered = 0
+        index = len(self.messages) - 1
+        while index >= 0 and self.messages[index]["role"] == "tool":
+            answered += 1
+            index -= 1
+        if index < 0:
+            return
+
+        last = self.messages[index]
+        if last["role"] != "assistant":
+            return
+        for _ in range(len(last.get("tool_calls") or ()) - answered):
+            self.messages.append({"role": "tool", "content": json.dumps({"abgebrochen": True})})
+
+    def _process(self, user_input: str, verbose: bool) -> str:
+        """Tool-Loop einer Anfrage (siehe process)."""
         self.messages.append({"role": "user", "content": user_input})
 
-        max_iterations = 5
+        # Erwähnte Dateien lesen, während das Modell über die erste Antwort nachdenkt
+        referenced = find_referenced_paths(user_input, self.tool_config)
+        if referenced:
+            self.tool_config.read_cache.prefetch(referenced, READ_LIMIT_CHARS)
+
+        started = time.monotonic()
+        round_times: List[float] = []
+        call_cache: Dict[str, Dict[str, Any]] = {}
+        repeat_rounds = 0
+        exhausted: Optional[str] = None
         content = ""
 
-        for _ in range(max_iterations):
+        while True:
+            exhausted = self._budget_exhausted(started, round_times)
+            if exhausted:
+                break
+
+            round_start = time.monotonic()
             try:
-                response = self.client.chat(self.messages, use_tools=True)
+                response = self.client.chat(self.messages.materialize(), use_tools=True)
+            except CancelledError:
+                raise
             except Exception as e:
                 return f"Fehler: {e}"
 
@@ -686,6 +4459,7 @@ class PolylogBridge:
 
             if not tool_calls:
                 self.messages.append({"role": "assistant", "content": content})
+                round_times.append(time.monotonic() - round_start)
                 break
 
             assistant_msg = {"role": "assistant", "content": content}
@@ -693,49 +4467,175 @@ class PolylogBridge:
                 assistant_msg["tool_calls"] = tool_calls
             self.messages.append(assistant_msg)
 
-            for tc in tool_calls:
-                func = tc.get("function", {})
-                name = func.get("name", "")
-                args = func.get("arguments", {})
+            repeated = self._run_tool_calls(tool_calls, call_cache, verbose)
+            round_times.append(time.monotonic() - round_start)
 
-                if isinstance(args, str):
-                    try:
-                        args = json.loads(args)
-                    except json.JSONDecodeError:
-                        args = {}
+            # Nur noch Wiederholungen: das Modell dreht sich im Kreis
+            repeat_rounds = repeat_rounds + 1 if repeated == len(tool_calls) else 0
+            if repeat_rounds >= 2:
+                exhausted = "loop"
+                break
+
+        self.metrics.observe("loop.iterations", len(round_times))
+        if exhausted:
+            self.metrics.incr(f"loop.budget_exhausted.{exhausted}")
+            return self._force_final_answer(verbose)
+
+        return content
 
+    def _budget_exhausted(self, started: float, round_times: List[float]) -> Optional[str]:
+        """Prüft Iterations- und Zeitbudget. Gibt den Grund zurück oder None."""
+        if len(round_times) >= self.config.max_iterations:
+            return "iterations"
+
+        budget = self.config.max_turn_seconds
+        if budget is not None and round_times:
+            elapsed = time.monotonic() - started
+            # Passt eine weitere (durchschnittliche) Runde noch ins Budget?
+            expected = sum(round_times) / len(round_times)
+            if elapsed + expected > budget:
+                return "time"
+
+        return None
+
+    def _run_tool_calls(self, tool_calls: List[Dict], call_cache: Dict[str, Dict[str, Any]],
+                        verbose: bool) -> int:
+        """
+        Führt die Tool-Calls einer Runde aus.
+
+        Identische Aufrufe (Name + Argumente) innerhalb einer Anfrage werden
+        nicht erneut ausgeführt, sondern mit dem gecachten Ergebnis und einem
+        Hinweis beantwortet. Tools mit Seiteneffekten leeren den Cache.
+
+        Returns:
+            Anzahl wiederholter Aufrufe
+        """
+        repeated = 0
+        # Die Tool-Calls stehen in der zuletzt angehängten Assistant-Nachricht
+        message_index = len(self.messages) - 1
+
+        for position, tc in enumerate(tool_calls):
+            if self.client.cancelled:
+                raise CancelledError("Anfrage abgebrochen")
+
+            func = tc.get("function", {})
+            name = func.get("name", "")
+            args = func.get("arguments", {})
+
+            if isinstance(args, str):
+                try:
+                    args = json.loads(args)
+                except json.JSONDecodeError:
+                    args = {}
+
+            key = name + json.dumps(args, sort_keys=True, ensure_ascii=False)
+
+            if key in call_cache:
+                repeated += 1
+                self.metrics.incr("loop.repeated_calls")
+                if verbose:
+                    print(f"  ↺ {name}({args}) [wiederholt - Ergebnis aus Cache]")
+                result = dict(call_cache[key], hinweis=self.REPEAT_NUDGE)
+            else:
                 if verbose:
                     print(f"  → {name}({args})")
 
-                result = ToolRegistry.execute(name, args)
+                self.tool_config.last_write = None
+                result = ToolRegistry.execute(name, args, config=self.tool_config)
+                if ToolRegistry.is_mutating(name):
+                    call_cache.clear()
+                call_cache[key] = result
+                if self._should_elide(name, args) and result.get("success"):
+                    self._elide_write(message_index, position, args, self._previous_text())
+                self.tool_config.last_write = None  # alte Dateiversion nicht länger halten
+
+            self.messages.append({
+                "role": "tool",
+                "content": json.dumps(result, ensure_ascii=False)
+            })
+
+        return repeated
+
+    def _should_elide(self, name: str, args: Dict[str, Any]) -> bool:
+        """True wenn der Inhalt eines write_file im Verlauf gekürzt werden soll."""
+        content = args.get("content")
+        return (name == "write_file" and isinstance(content, str) and len(content) >= ELIDE_WRITE_CHARS
+                and self.client.stateless)
+
+    def _previous_text(self) -> Optional[str]:
+        """Vorversion des letzten write_file als Text (None: neue Datei bzw. zu groß für einen Diff)."""
+        last = self.tool_config.last_write
+        if last is None or last[1] is None or len(last[1]) > 2 * 1024 * 1024:
+            return None
+        return last[1].decode("utf-8", errors="replace").replace("\r\n", "\n")
+
+    def _elide_write(self, index: int, position: int, args: Dict[str, Any], previous: Optional[str]):
+        """Ersetzt den Dateiinhalt im Verlauf durch Pfad, Größe, Hash und Kurz-Diff."""
+        compact = elide_write_arguments(args, previous)
+        self.messages.replace_call_arguments(index, position, compact)
+        self.metrics.incr("history.elided_chars", len(args["content"]) - len(compact["content_elided"]))
+
+    def _force_final_answer(self, verbose: bool) -> str:
+        """Fordert nach erschöpftem Budget eine finale Antwort ohne Tools an."""
+        if verbose:
+            print("  ⚠ Tool-Budget erschöpft - fordere finale Antwort an")
 
-                self.messages.append({
-                    "role": "tool",
-                    "content": json.dumps(result, ensure_ascii=False)
-                })
+        self.metrics.incr("loop.forced_final")
+        self.messages.append({"role": "user", "content": self.FINAL_ANSWER_NUDGE})
+        try:
+            response = self.client.chat(self.messages.materialize(), use_tools=False)
+        except CancelledError:
+            raise
+        except Exception as e:
+            return f"Fehler: {e}"
 
+        content = response.get("content", "")
+        self.messages.append({"role": "assistant", "content": content})
         return content
 
     def reset(self):
         """Setzt Konversation zurück."""
         self._init_messages()
 
+    def undo(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Macht den letzten write_file dieser Session rückgängig."""
+        if self.snapshots is None:
+            return None
+        result = self.snapshots.undo(force)
+        if result and result["success"]:
+            _after_write(self.tool_config.working_dir / result["path"], self.tool_config)
+        return result
+
+    def restore(self, seq: Optional[int] = None, timestamp: Optional[float] = None,
+                force: bool = False) -> List[Dict[str, Any]]:
+        """Setzt alle Dateien dieser Session auf den Stand vor Eintrag seq bzw. vor timestamp."""
+        if self.snapshots is None:
+            return []
+        results = self.snapshots.restore(seq, timestamp, force)
+        for result in results:
+            if result["success"]:
+                _after_write(self.tool_config.working_dir / result["path"], self.tool_config)
+        return results
+
     def run_interactive(self):
         """Interaktiver Modus."""
         print("=" * 60)
         print("POLYLOG BRIDGE")
         print(f"Modell: {self.config.model}")
-        print(f"Tools: {', '.join(ToolRegistry.list_tools())}")
+        print(f"Tools: {', '.join(ToolRegistry.list_tools(self.client.excluded_groups))}")
         print("=" * 60)
-        print("Befehle: /quit, /reset, /tools, /verbose, /bootblock, /help")
+        print("Befehle: /quit, /reset, /tools, /verbose, /bootblock, /stats, /undo, /help")
         print("=" * 60)
 
         if not self.client.is_available():
             print(f"\n⚠️  Ollama nicht erreichbar")
             return
 
+        # Modell laden während der User die erste Eingabe tippt
+        self.client.preload_async()
+
         # Bootblock-Status anzeigen
-        if PromptRegistry.has_bootblock():
+        if PromptRegistry.has_bootblock(self.tool_config.working_dir):
             print("\n✓ Bootblock geladen (Werte-Layer aktiv)")
         else:
             print("\n" + "=" * 60)
@@ -746,7 +4646,7 @@ class PolylogBridge:
             print("Ohne Bootblock arbeitet der Assistent OHNE Werte-Layer.")
             print()
             print("Lösung: Erstelle eine Datei 'bootblock.md' im Projektverzeichnis")
-            print(f"        Pfad: {_config.working_dir / 'bootblock.md'}")
+            print(f"        Pfad: {self.tool_config.working_dir / 'bootblock.md'}")
             print()
             print("Vorlage: https://github.com/Jan-Christoph/polylog-public/blob/main/bootblock.md")
             print("=" * 60)
@@ -797,23 +4697,88 @@ class PolylogBridge:
                 self.reset()
                 print("✓ Reset\n")
                 continue
+            elif user_input.lower() == "/undo":
+                try:
+                    result = self.undo()
+                except (OSError, zlib.error) as e:
+                    print(f"⚠️  Snapshot-Speicher: {e}\n")
+                    continue
+                if result is None:
+                    print("Nichts rückgängig zu machen.\n")
+                elif result["success"]:
+                    print(f"✓ {result['path']} zurückgesetzt (#{result['seq']})\n")
+                else:
+                    print(f"⚠️  {result['path']}: {result['error']}\n")
+                continue
+            elif user_input.lower() == "/snapshots":
+                entries = self.snapshots.entries() if self.snapshots else []
+                for entry in entries[-20:]:
+                    action = f"undo #{entry['undo_of']}" if "undo_of" in entry else \
+                        ("neu" if entry["old"] is None else "geändert")
+                    print(f"  #{entry['seq']:<5} {time.strftime('%H:%M:%S', time.localtime(entry['time']))}  "
+                          f"{action:12} {entry['path']}")
+                print("(keine Änderungen in dieser Session)\n" if not entries else "")
+                continue
+            elif user_input.lower().startswith("/restore"):
+                arg = user_input[len("/restore"):].strip().lstrip("#")
+                if not arg.isdigit():
+                    print("Verwendung: /restore <nr> (siehe /snapshots)\n")
+                    continue
+                try:
+                    results = self.restore(seq=int(arg))
+                except (OSError, zlib.error) as e:
+                    print(f"⚠️  Snapshot-Speicher: {e}\n")
+                    continue
+                for result in results:
+                    mark = "✓" if result["success"] else "⚠️ "
+                    print(f"  {mark} {result['path']} (#{result['seq']}) {result.get('error', '')}")
+                print()
+                continue
             elif user_input.lower() == "/tools":
                 print("Tools:")
-                for name, t in ToolRegistry._tools.items():
-                    desc = t['schema']['function']['description']
-                    print(f"  - {name}: {desc}")
+                for name in ToolRegistry.list_tools(self.client.excluded_groups):
+                    print(f"  - {name}: {ToolRegistry.get_description(name)}")
                 continue
             elif user_input.lower() == "/verbose":
                 verbose = not verbose
                 print(f"Verbose: {'ON' if verbose else 'OFF'}\n")
                 continue
             elif user_input.lower() == "/bootblock":
-                bootblock = PromptRegistry.get_bootblock()
+                bootblock = PromptRegistry.get_bootblock(self.tool_config.working_dir)
                 if bootblock:
                     print(bootblock)
                 else:
                     print("\n⚠️  KEIN BOOTBLOCK GEFUNDEN")
-                    print(f"Erstelle: {_config.working_dir / 'bootblock.md'}\n")
+                    print(f"Erstelle: {self.tool_config.working_dir / 'bootblock.md'}\n")
+                continue
+            elif user_input.lower() == "/stats":
+                print("Metriken:")
+                print(self.metrics.format())
+                usage = self.memory_usage()
+                print(f"  Verlauf: {usage['messages']} Nachrichten, "
+                      f"{usage['resident_bytes'] / 1024:.0f} KiB im Speicher, "
+                      f"{usage['spilled_bytes'] / 1024:.0f} KiB ausgelagert")
+                prefetched = self.metrics.get("prefetch.files")
+                if prefetched:
+                    print(f"  Prefetch-Trefferquote: {self.metrics.get('prefetch.hits') / prefetched:.0%}")
+                watcher = self.tool_config.watcher
+                if watcher is not None:
+                    print(f"  Watcher: {watcher.backend or 'startet'}, {watcher.batches} Bündel, "
+                          f"{self.metrics.get('watch.invalidations'):.0f} Cache-Einträge verworfen")
+                recovered = self.metrics.get("tool_calls.recovered")
+                if recovered:
+                    print(f"  Tool-Calls aus Text erkannt: {recovered:.0f} Antworten (je eine Runde gespart)")
+                saved = self.metrics.snapshot()["observations"].get("tools.tokens_saved")
+                if saved:
+                    print(f"  Tool-Schemas: Ø {saved['avg']:.0f} Tokens pro Anfrage gespart "
+                          f"({saved['total']:.0f} insgesamt)")
+                cache_rate = self.metrics.ratio("response_cache.hits", "response_cache.misses")
+                if cache_rate is not None:
+                    print(f"  Antwort-Cache-Trefferquote: {cache_rate:.0%}")
+                queue = self.client.scheduler.snapshot()
+                print(f"  Queue: {queue['in_flight']}/{queue['max_in_flight']} aktiv, "
+                      f"wartend {queue['waiting']}")
+                print()
                 continue
             elif user_input.lower() == "/help":
                 print("\n=== POLYLOG BRIDGE HILFE ===")
@@ -821,12 +4786,21 @@ class PolylogBridge:
                 print("  read_file   - Liest eine Datei")
                 print("  write_file  - Schreibt eine Datei")
                 print("  webrecherche - Web-Recherche (Wikipedia)")
+                print("  read_files  - Liest mehrere Dateien (Liste/Glob)")
+                print("  list_dir    - Verzeichnisbaum anzeigen")
+                print("  git_status  - Git-Zustand: clean/dirty, HEAD, geänderte Dateien")
+                print("  run_command - Befehl im Projekt ausführen (nur mit --allow-commands)")
                 print("\nBEFEHLE:")
                 print("  /quit      - Beenden")
                 print("  /reset     - Konversation zurücksetzen")
                 print("  /tools     - Verfügbare Tools anzeigen")
                 print("  /verbose   - Tool-Aufrufe anzeigen")
                 print("  /bootblock - Werte-Layer anzeigen")
+                print("  /stats     - Metriken der Session anzeigen")
+                print("  /undo      - Letzten write_file rückgängig machen")
+                print("  /snapshots - Änderungen dieser Session (mit Nummer)")
+                print("  /restore N - Alles ab Änderung #N zurücksetzen")
+                print("  Ctrl+C     - Laufende Antwort abbrechen (Verlauf bleibt erhalten)")
                 print()
                 continue
 
@@ -843,24 +4817,87 @@ class PolylogBridge:
 
 def test_mode():
     """Testet Tools ohne Ollama."""
+    import platform
+
     print("=" * 60)
     print("POLYLOG BRIDGE - Test")
     print(f"Platform: {platform.system()}")
     print(f"Tools: {ToolRegistry.list_tools()}")
     print("=" * 60)
 
-    set_config(ToolConfig(working_dir=Path(".")))
+    set_config(ToolConfig(working_dir=Path(".").resolve()))
 
     # Test read_file
     print("\n--- read_file ---")
     result = read_file("README.md")
     print(f"Success: {result.get('success')}, Size: {result.get('size', 'N/A')}")
 
+    # Test read_files / list_dir
+    print("\n--- read_files ---")
+    result = read_files(pattern="*.md")
+    print(f"Success: {result.get('success')}, Dateien: {len(result.get('files', []))}, "
+          f"Zeichen: {result.get('used_chars')}")
+
+    print("\n--- list_dir ---")
+    result = list_dir(".", depth=1)
+    print(f"Success: {result.get('success')}, Einträge: {result.get('entries')}")
+
+    print("\n--- run_command ---")
+    result = ToolRegistry.execute(
+        "run_command", {"command": f'"{sys.executable}" --version'},
+        config=ToolConfig(working_dir=Path(".").resolve(), allow_commands=True)
+    )
+    print(f"Success: {result.get('success')}, Exit: {result.get('exit_code')}, "
+          f"Ausgabe: {result.get('output', '').strip()}")
+
     # Test webrecherche
     print("\n--- webrecherche ---")
     result = webrecherche("Python")
     print(f"Results: {result.get('results_count')}")
 
+    # Tool-Calls aus Text: Beispiele in einer Erklärung dürfen nichts ausführen
+    print("\n--- Tool-Calls aus Text ---")
+    _, calls, _ = parse_text_tool_calls(
+        '<tool_call>{"name": "read_file", "arguments": {"path": "README.md"}}</tool_call>'
+    )
+    assert [c["function"]["name"] for c in calls] == ["read_file"], calls
+    _, calls, _ = parse_text_tool_calls(
+        'So würde ein Aufruf aussehen, ich führe ihn aber NICHT aus:\n'
+        '```json\n{"name": "write_file", "arguments": {"path": "x.txt", "content": "..."}}\n```'
+    )
+    assert not calls, calls
+    _, calls, _ = parse_text_tool_calls('{"name": "run_command", "arguments": {"command": "rm -rf build"}}')
+    assert not calls, calls
+    print("Marker erkannt, Beispiele mit write_file/run_command ignoriert ✓")
+
+    parser = ToolCallParser()
+    shown = "".join(parser.feed(part) for part in
+                    ["Ich lese die Datei. <tool", '_call>{"name": "read_file", ',
+                     '"arguments": {"path": "README.md"}}</tool_call>'])
+    content, calls = parser.finish()
+    assert shown == "Ich lese die Datei. ", shown
+    assert [c["function"]["name"] for c in calls] == ["read_file"], calls
+    print("Gestreamt: nur Text vor dem Marker angezeigt ✓")
+
+    # Abbruch mitten in einer Tool-Runde: jeder Tool-Call braucht eine Antwort
+    print("\n--- Abbruch während Tool-Calls ---")
+    bridge = PolylogBridge(BridgeConfig(working_dir=Path(".").resolve()))
+    call = {"function": {"name": "read_file", "arguments": {"path": "README.md"}}}
+    bridge.messages.extend([
+        {"role": "user", "content": "lies zweimal"},
+        {"role": "assistant", "content": "", "tool_calls": [call, call]},
+        {"role": "tool", "content": "{}"},
+    ])
+    bridge._answer_open_tool_calls()
+    assert [m["role"] for m in bridge.messages][-3:] == ["assistant", "tool", "tool"], bridge.messages[-3:]
+    assert json.loads(bridge.messages[-1]["content"]) == {"abgebrochen": True}
+    print("Offene Tool-Calls mit Platzhalter beantwortet ✓")
+
+    # Ohne allow_commands kennt der System-Prompt run_command nicht
+    assert "- run_command:" not in bridge.messages[0]["content"]
+    assert "- run_command:" in get_system_prompt(".", include_bootblock=False)
+    print("System-Prompt nennt nur freigegebene Tools ✓")
+
     # Schemas
     print("\n--- Tool Schemas ---")
     for schema in ToolRegistry.get_schemas():
@@ -869,13 +4906,110 @@ def test_mode():
     print("\n✓ Tests abgeschlossen")
 
 
+# Startzeit-Budget in ms über dem nackten Interpreter-Start (Regressionsgrenze)
+STARTUP_BUDGET_MS = {
+    "import": 40.0,   # import polylog_bridge
+    "bridge": 50.0,   # import + PolylogBridge()
+}
+
+
+def benchmark_startup(runs: int = 10) -> bool:
+    """
+    Misst Import- und Startzeit in frischen Interpretern.
+
+    Verglichen wird jeweils der Median abzüglich des nackten
+    Interpreter-Starts mit STARTUP_BUDGET_MS.
+
+    Returns:
+        False wenn ein Budget überschritten wurde
+    """
+    import statistics
+    import subprocess
+
+    module_dir = str(Path(__file__).parent)
+    snippets = {
+        "python": "pass",
+        "import": "import polylog_bridge",
+        "bridge": "import polylog_bridge as p; p.PolylogBridge()",
+    }
+
+    def run(code: str, *flags: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, *flags, "-c", code],
+            cwd=module_dir, capture_output=True, text=True, check=True
+        )
+
+    # Aufwärmen: .pyc und Schema-Cache erzeugen
+    run("import polylog_bridge as p; p.ToolRegistry.get_schemas()")
+
+    medians = {}
+    for name, code in snippets.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            run(code)
+            timings.append((time.perf_counter() - start) * 1000)
+        medians[name] = statistics.median(timings)
+
+    print("=" * 60)
+    print(f"POLYLOG BRIDGE - Startzeit ({runs} Läufe, Median)")
+    print("=" * 60)
+    print(f"  Interpreter:  {medians['python']:6.1f} ms")
+
+    ok = True
+    for name, budget in STARTUP_BUDGET_MS.items():
+        net = medians[name] - medians["python"]
+        passed = net <= budget
+        ok = ok and passed
+        print(f"  {name:<12}  {net:6.1f} ms  (Budget {budget:.0f} ms) {'✓' if passed else '✗'}")
+
+    if not ok:
+        # Größte Importe zeigen
+        stderr = run("import polylog_bridge", "-X", "importtime").stderr
+        rows = []
+        for line in stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[1].strip().isdigit():
+                rows.append((int(parts[1]), parts[2].strip()))
+        print("\n  Teuerste Importe (kumulativ):")
+        for us, module in sorted(rows, reverse=True)[:8]:
+            print(f"    {us / 1000:6.1f} ms  {module}")
+
+    return ok
+
+
 def main():
     import argparse
 
     parser = argparse.ArgumentParser(description="Polylog Bridge")
     parser.add_argument("--test", action="store_true", help="Test-Modus")
+    parser.add_argument("--bench-startup", action="store_true",
+                        help="Misst Import-/Startzeit (Exit-Code 1 bei Budget-Überschreitung)")
     parser.add_argument("--model", default="devstral-small-2:latest", help="Modell")
     parser.add_argument("--timeout", type=int, default=300, help="Timeout")
+    parser.add_argument("--temperature", type=float, default=0.7, help="Temperatur (0 = deterministisch)")
+    parser.add_argument("--seed", type=int, default=None, help="Fester Seed für reproduzierbare Antworten")
+    parser.add_argument("--response-cache", metavar="DIR", default=None,
+                        help="Antwort-Cache in DIR (nur bei --temperature 0 oder --seed)")
+    parser.add_argument("--response-cache-mb", type=int, default=256,
+                        help="Maximale Größe des Antwort-Caches in MB")
+    parser.add_argument("--max-iterations", type=int, default=5, help="Max. Tool-Runden pro Anfrage")
+    parser.add_argument("--max-turn-seconds", type=float, default=None,
+                        help="Zeitbudget pro Anfrage in Sekunden")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Gleichzeitige Anfragen an Ollama (default: OLLAMA_NUM_PARALLEL oder 1)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Batch-Priorität: interaktive Sessions werden vorgezogen")
+    parser.add_argument("--allow-commands", action="store_true",
+                        help="Erlaubt dem Modell, Befehle im Projekt auszuführen (run_command)")
+    parser.add_argument("--autotune", action="store_true",
+                        help="num_ctx/num_batch/num_thread/num_gpu für Host + Modell einmessen und speichern")
+    parser.add_argument("--no-watch", action="store_true",
+                        help="Kein Dateisystem-Watcher im interaktiven Modus")
+    parser.add_argument("--profile", action="store_true",
+                        help="CPU-/Speicherprofil pro Anfrage schreiben und zusammenfassen")
+    parser.add_argument("--profile-dir", default="polylog-profile",
+                        help="Zielverzeichnis für --profile")
     parser.add_argument("query", nargs="?", help="Einzel-Anfrage")
 
     args = parser.parse_args()
@@ -884,13 +5018,35 @@ def main():
         test_mode()
         return
 
+    if args.bench_startup:
+        sys.exit(0 if benchmark_startup() else 1)
+
     config = BridgeConfig(
         model=args.model,
         timeout=args.timeout,
-        working_dir=Path(".").resolve()
+        temperature=args.temperature,
+        seed=args.seed,
+        response_cache_dir=Path(args.response_cache).resolve() if args.response_cache else None,
+        response_cache_max_bytes=args.response_cache_mb * 1024 * 1024,
+        # Watcher lohnt sich nur für längere (interaktive) Sessions
+        watch_files=not args.query and not args.no_watch,
+        priority="batch" if args.batch else "interactive",
+        allow_commands=args.allow_commands,
+        max_iterations=args.max_iterations,
+        max_turn_seconds=args.max_turn_seconds,
+        working_dir=Path(".").resolve(),
+        profile_dir=Path(args.profile_dir).resolve() if args.profile else None
     )
+    if args.max_in_flight:
+        config.max_in_flight = args.max_in_flight
+
+    if args.autotune:
+        autotune(OllamaClient(config))
+        return
 
     bridge = PolylogBridge(config)
+    if args.response_cache and not bridge.client.deterministic:
+        print("Hinweis: Antwort-Cache nur aktiv mit --temperature 0 oder --seed")
 
     if args.query:
         print(bridge.process(args.query, verbose=True))
@@ -10,6 +10,7 @@ Startet Ollama und lädt devstral-small-2:latest
 Usage:
     python start_ollama.py              # Startet Ollama + prüft devstral-small-2:latest
     python start_ollama.py --pull       # Lädt devstral-small-2:latest herunter
+    python start_ollama.py --pull a b   # Lädt mehrere Modelle parallel herunter
     python start_ollama.py --chat       # Startet interaktiven Chat
     python start_ollama.py --status     # Zeigt Status
 
@@ -18,12 +19,17 @@ Datum: 13.01.2026
 Licensed under EUPL 1.2
 """
 
+import json
 import subprocess
 import sys
+import threading
 import time
 import platform
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
 
 # Optional: requests für API-Checks
 try:
@@ -35,7 +41,7 @@ except ImportError:
 
 def ensure_requests_installed() -> bool:
     """Installiert requests automatisch falls nicht vorhanden."""
-    global REQUESTS_AVAILABLE
+    global REQUESTS_AVAILABLE, requests
     if REQUESTS_AVAILABLE:
         return True
 
@@ -47,7 +53,7 @@ def ensure_requests_installed() -> bool:
             stderr=subprocess.DEVNULL
         )
         print("✓ requests installiert")
-        # Neu importieren
+        # Neu importieren (global, damit die API-Checks es nutzen)
         import requests
         REQUESTS_AVAILABLE = True
         return True
@@ -63,7 +69,11 @@ def ensure_requests_installed() -> bool:
 
 MODEL = "devstral-small-2:latest"  # devstral-small-2:latest (optimiert für Code)
 OLLAMA_HOST = "http://localhost:11434"
-PULL_TIMEOUT = 1800  # 30 Minuten für Download
+PULL_TIMEOUT = 1800  # 30 Minuten für Download (nur Fallback über die ollama-CLI)
+PULL_STALL_TIMEOUT = 120  # Sekunden ohne Download-Fortschritt bis zum Neuversuch
+PULL_RETRIES = 5  # Neuversuche in Folge ohne Fortschritt
+READY_TIMEOUT = 15.0  # Sekunden bis der frisch gestartete Server antworten muss
+KEEP_ALIVE = "30m"  # Wie lange Ollama das vorgeladene Modell im Speicher hält
 
 
 # =============================================================================
@@ -96,26 +106,91 @@ def is_ollama_installed() -> bool:
         return False
 
 
-def is_ollama_running() -> bool:
-    """Prüft ob Ollama Server läuft."""
+def _api_json(path: str, payload: Optional[dict] = None, timeout: float = 2) -> Optional[dict]:
+    """GET (oder POST mit payload) gegen die Ollama-API. None bei Fehler."""
+    url = f"{OLLAMA_HOST}{path}"
+
     if not REQUESTS_AVAILABLE:
         # Fallback ohne requests
         try:
             import urllib.request
-            urllib.request.urlopen(f"{OLLAMA_HOST}/api/tags", timeout=2)
-            return True
+            data = json.dumps(payload).encode("utf-8") if payload is not None else None
+            request = urllib.request.Request(
+                url, data=data, headers={"Content-Type": "application/json"}
+            )
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read().decode("utf-8") or "{}")
         except Exception:
-            return False
+            return None
 
     try:
-        response = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=2)
-        return response.status_code == 200
+        if payload is None:
+            response = requests.get(url, timeout=timeout)
+        else:
+            response = requests.post(url, json=payload, timeout=timeout)
+        if response.status_code != 200:
+            return None
+        return response.json()
     except Exception:
-        return False
+        return None
+
+
+def _model_names(data: Optional[dict]) -> Optional[Set[str]]:
+    """Extrahiert Modellnamen aus /api/tags bzw. /api/ps."""
+    if data is None:
+        return None
+    names = set()
+    for entry in data.get("models", []):
+        for key in ("name", "model"):
+            if entry.get(key):
+                names.add(entry[key])
+    return names
+
+
+def _matches(model: str, names: Set[str]) -> bool:
+    """Vergleicht Modellnamen exakt (ohne Tag gilt ':latest')."""
+    if ":" not in model:
+        model = f"{model}:latest"
+    return model in names
+
+
+def list_local_models() -> Optional[Set[str]]:
+    """Installierte Modelle laut /api/tags (None wenn Server nicht erreichbar)."""
+    return _model_names(_api_json("/api/tags"))
+
+
+def list_loaded_models() -> Optional[Set[str]]:
+    """Aktuell geladene Modelle laut /api/ps (None wenn Server nicht erreichbar)."""
+    return _model_names(_api_json("/api/ps"))
+
+
+def wait_until(check: Callable[[], bool], timeout: float,
+               initial_delay: float = 0.05, max_delay: float = 1.0) -> bool:
+    """Ruft check() mit exponentiellem Backoff auf bis True oder Timeout."""
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        if check():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+
+def is_ollama_running() -> bool:
+    """Prüft ob Ollama Server läuft."""
+    return _api_json("/api/tags") is not None
 
 
 def is_model_available(model: str) -> bool:
     """Prüft ob Modell verfügbar ist."""
+    names = list_local_models()
+    if names is not None:
+        return _matches(model, names)
+
+    # Fallback ohne erreichbare API
     try:
         result = subprocess.run(
             ["ollama", "list"],
@@ -128,6 +203,28 @@ def is_model_available(model: str) -> bool:
         return False
 
 
+def check_readiness(model: str, check_installed: bool = True) -> dict:
+    """
+    Prüft Installation, Server, verfügbare und geladene Modelle parallel.
+
+    Returns:
+        dict mit installed, running, available, loaded
+    """
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        installed = pool.submit(is_ollama_installed) if check_installed else None
+        tags = pool.submit(list_local_models)
+        loaded = pool.submit(list_loaded_models)
+
+        local_names = tags.result()
+        loaded_names = loaded.result()
+        return {
+            "installed": installed.result() if installed else True,
+            "running": local_names is not None,
+            "available": local_names is not None and _matches(model, local_names),
+            "loaded": loaded_names is not None and _matches(model, loaded_names),
+        }
+
+
 def start_ollama_server() -> bool:
     """Startet Ollama Server im Hintergrund."""
     print("Starte Ollama Server...")
@@ -150,13 +247,11 @@ def start_ollama_server() -> bool:
                 start_new_session=True
             )
 
-        # Warten bis Server bereit ist
-        for i in range(10):
-            time.sleep(1)
-            if is_ollama_running():
-                print("✓ Ollama Server gestartet")
-                return True
-            print(f"  Warte... ({i+1}/10)")
+        # Warten bis Server bereit ist (kurze Intervalle, dann länger)
+        started = time.monotonic()
+        if wait_until(is_ollama_running, READY_TIMEOUT):
+            print(f"✓ Ollama Server gestartet ({time.monotonic() - started:.1f}s)")
+            return True
 
         print("✗ Timeout beim Starten von Ollama")
         return False
@@ -166,12 +261,237 @@ def start_ollama_server() -> bool:
         return False
 
 
-def pull_model(model: str) -> bool:
-    """Lädt Modell herunter."""
+def _format_bytes(n: float) -> str:
+    """Formatiert Bytes menschenlesbar."""
+    if n < 1024:
+        return f"{int(n)} B"
+    for unit in ("KB", "MB"):
+        n /= 1024
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+    return f"{n / 1024:.1f} GB"
+
+
+def _format_eta(seconds: Optional[float]) -> str:
+    """Formatiert Restzeit als mm:ss bzw. h:mm:ss."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+class StalledError(Exception):
+    """Download hat länger als PULL_STALL_TIMEOUT keinen Fortschritt gemacht."""
+
+
+class PullCancelled(Exception):
+    """Pull wurde über das gemeinsame Abbruch-Event beendet (Ctrl+C in pull_models)."""
+
+
+class PullProgress:
+    """Fortschritt eines Pulls: pro Layer, Durchsatz und Restzeit."""
+
+    RATE_WINDOW = 10.0  # Sekunden für den gleitenden Durchsatz
+
+    def __init__(self, model: str):
+        self.model = model
+        self.status = "starte"
+        self.layers: Dict[str, List[int]] = {}  # digest -> [completed, total]
+        self.current_layer: Optional[str] = None
+        self.last_progress = time.monotonic()
+        self._samples = deque()
+
+    @property
+    def completed(self) -> int:
+        return sum(done for done, _ in self.layers.values())
+
+    @property
+    def total(self) -> int:
+        return sum(total for _, total in self.layers.values())
+
+    def update(self, event: dict) -> bool:
+        """Verarbeitet ein Event aus /api/pull. True wenn Bytes dazukamen."""
+        self.status = event.get("status", self.status)
+        digest = event.get("digest")
+        if not digest or not event.get("total"):
+            return False
+
+        self.current_layer = digest
+        previous = self.completed
+        self.layers[digest] = [event.get("completed", 0), event["total"]]
+        now = time.monotonic()
+        if self.completed <= previous:
+            return False
+
+        self.last_progress = now
+        self._samples.append((now, self.completed))
+        while self._samples and now - self._samples[0][0] > self.RATE_WINDOW:
+            self._samples.popleft()
+        return True
+
+    def rate(self) -> float:
+        """Durchsatz in Bytes/s über das gleitende Fenster."""
+        if len(self._samples) < 2:
+            return 0.0
+        (t0, b0), (t1, b1) = self._samples[0], self._samples[-1]
+        return (b1 - b0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        """Geschätzte Restzeit in Sekunden."""
+        rate = self.rate()
+        if rate <= 0 or not self.total:
+            return None
+        return (self.total - self.completed) / rate
+
+    def stalled_for(self) -> float:
+        return time.monotonic() - self.last_progress
+
+    def format_line(self) -> str:
+        """Einzeilige Statusanzeige."""
+        if not self.total:
+            return f"  {self.model}: {self.status}"
+
+        percent = 100 * self.completed / self.total
+        line = (
+            f"  {self.model}: {_format_bytes(self.completed)}/{_format_bytes(self.total)}"
+            f" ({percent:.0f}%)"
+        )
+        if self.current_layer in self.layers:
+            done, total = self.layers[self.current_layer]
+            short = self.current_layer.split(":")[-1][:12]
+            line += f" · Layer {short} {100 * done / total:.0f}%"
+        line += f" · {_format_bytes(self.rate())}/s · ETA {_format_eta(self.eta())}"
+        return line
+
+
+_print_lock = threading.Lock()
+
+
+def _pull_via_api(model: str, progress: PullProgress, stall_timeout: float,
+                  show: Callable[[PullProgress, bool], None],
+                  cancel: Optional[threading.Event] = None) -> bool:
+    """Ein Pull-Versuch über die Streaming-API. Wirft bei Abbruch/Stillstand."""
+    progress.last_progress = time.monotonic()
+    with requests.post(
+        f"{OLLAMA_HOST}/api/pull",
+        json={"model": model, "stream": True},
+        stream=True,
+        # Read-Timeout greift pro empfangenem Chunk, nicht für den ganzen Download
+        timeout=(5, stall_timeout)
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            # Verlassen des with-Blocks schließt die Verbindung
+            if cancel is not None and cancel.is_set():
+                raise PullCancelled()
+            if not line:
+                continue
+            event = json.loads(line)
+            if event.get("error"):
+                raise RuntimeError(event["error"])
+
+            progress.update(event)
+            if event.get("status") == "success":
+                show(progress, True)
+                return True
+
+            # Server sendet Status, aber keine Bytes mehr
+            if progress.stalled_for() > stall_timeout:
+                raise StalledError(f"kein Fortschritt seit {stall_timeout:.0f}s")
+            show(progress, False)
+
+    raise ConnectionError("Stream vorzeitig beendet")
+
+
+def pull_model(model: str, stall_timeout: float = PULL_STALL_TIMEOUT,
+               retries: int = PULL_RETRIES, single_line: bool = True,
+               cancel: Optional[threading.Event] = None) -> bool:
+    """
+    Lädt Modell herunter.
+
+    Nutzt den Streaming-Endpunkt /api/pull mit Fortschritt pro Layer.
+    Nach Unterbrechungen wird neu angefragt; Ollama setzt dabei mit den
+    bereits geladenen Layern fort. Abgebrochen wird nur bei Stillstand,
+    nicht nach einer festen Gesamtdauer - oder wenn cancel gesetzt wird.
+    """
     print(f"Lade {model} herunter...")
     print("(Dies kann einige Minuten dauern, ca. 14GB)")
     print()
 
+    if not REQUESTS_AVAILABLE:
+        return _pull_via_cli(model)
+
+    progress = PullProgress(model)
+    last_shown = [0.0]
+
+    def show(p: PullProgress, final: bool):
+        now = time.monotonic()
+        if not final and now - last_shown[0] < (0.2 if single_line else 2.0):
+            return
+        last_shown[0] = now
+        with _print_lock:
+            if single_line and sys.stdout.isatty():
+                print("\r" + p.format_line().ljust(100), end="\n" if final else "", flush=True)
+            else:
+                print(p.format_line(), flush=True)
+
+    failures = 0
+    delay = 1.0
+    while True:
+        before = progress.completed
+        try:
+            return _pull_via_api(model, progress, stall_timeout, show, cancel)
+        except (KeyboardInterrupt, PullCancelled):
+            with _print_lock:
+                print(f"\n✗ {model}: abgebrochen ({_format_bytes(progress.completed)} bleiben für die Fortsetzung erhalten)")
+            return False
+        except Exception as e:
+            if progress.completed > before:
+                # Fortschritt gemacht: Zähler zurücksetzen
+                failures = 0
+                delay = 1.0
+            failures += 1
+            if failures > retries:
+                print(f"\n✗ Fehler beim Download: {e}")
+                return False
+            with _print_lock:
+                print(
+                    f"\n  {model}: unterbrochen ({e}) - setze in {delay:.0f}s fort "
+                    f"({_format_bytes(progress.completed)} bereits geladen, "
+                    f"Versuch {failures}/{retries})"
+                )
+            if cancel is not None:
+                if cancel.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+def pull_models(models: List[str], **kwargs) -> Dict[str, bool]:
+    """Lädt mehrere Modelle parallel herunter."""
+    if len(models) == 1:
+        return {models[0]: pull_model(models[0], **kwargs)}
+
+    kwargs.setdefault("single_line", False)
+    cancel = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(models))
+    futures = {model: pool.submit(pull_model, model, cancel=cancel, **kwargs) for model in models}
+    try:
+        return {model: future.result() for model, future in futures.items()}
+    except KeyboardInterrupt:
+        # Worker beenden sich bei der nächsten Stream-Zeile; nicht auf sie warten
+        cancel.set()
+        return {model: future.done() and not future.cancelled() and future.exception() is None
+                and future.result() for model, future in futures.items()}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _pull_via_cli(model: str) -> bool:
+    """Fallback ohne requests: ollama pull als Subprozess."""
     try:
         result = subprocess.run(
             ["ollama", "pull", model],
@@ -203,8 +523,10 @@ def show_status():
     print("Status:")
     print()
 
+    status = check_readiness(MODEL)
+
     # Ollama installiert?
-    if is_ollama_installed():
+    if status["installed"]:
         print("  ✓ Ollama installiert")
     else:
         print("  ✗ Ollama nicht gefunden")
@@ -212,13 +534,15 @@ def show_status():
         return
 
     # Server läuft?
-    if is_ollama_running():
+    if status["running"]:
         print("  ✓ Ollama Server läuft")
     else:
         print("  ○ Ollama Server nicht aktiv")
 
     # Modell verfügbar?
-    if is_model_available(MODEL):
+    if status["loaded"]:
+        print(f"  ✓ {MODEL} verfügbar (geladen)")
+    elif status["available"]:
         print(f"  ✓ {MODEL} verfügbar")
     else:
         print(f"  ○ {MODEL} nicht heruntergeladen")
@@ -249,8 +573,8 @@ def main():
         description="Polylog: Ollama + Devstral Starter"
     )
     parser.add_argument(
-        "--pull", action="store_true",
-        help="Lädt Devstral herunter"
+        "--pull", nargs="*", metavar="MODELL",
+        help="Lädt Devstral (oder die angegebenen Modelle parallel) herunter"
     )
     parser.add_argument(
         "--chat", action="store_true",
@@ -275,8 +599,11 @@ def main():
         show_status()
         return
 
+    # Installation, Server und Modelle parallel prüfen
+    status = check_readiness(model)
+
     # Prüfen ob Ollama installiert ist
-    if not is_ollama_installed():
+    if not status["installed"]:
         print("✗ Ollama nicht gefunden.")
         print()
         print("Installation:")
@@ -288,25 +615,29 @@ def main():
     print("✓ Ollama installiert")
 
     # Nur Pull
-    if args.pull:
-        if not is_ollama_running():
+    if args.pull is not None:
+        if not status["running"]:
             if not start_ollama_server():
                 sys.exit(1)
 
-        if pull_model(model):
-            print(f"✓ {model} erfolgreich heruntergeladen")
-        else:
-            print(f"✗ Fehler beim Herunterladen von {model}")
+        results = pull_models(args.pull or [model])
+        for name, ok in results.items():
+            if ok:
+                print(f"✓ {name} erfolgreich heruntergeladen")
+            else:
+                print(f"✗ Fehler beim Herunterladen von {name}")
+        if not all(results.values()):
             sys.exit(1)
         return
 
     # Nur Chat
     if args.chat:
-        if not is_ollama_running():
+        if not status["running"]:
             if not start_ollama_server():
                 sys.exit(1)
+            status = check_readiness(model, check_installed=False)
 
-        if not is_model_available(model):
+        if not status["available"]:
             print(f"{model} nicht gefunden. Lade herunter...")
             if not pull_model(model):
                 sys.exit(1)
@@ -315,16 +646,19 @@ def main():
         return
 
     # Standard: Server starten und Status prüfen
-    if is_ollama_running():
+    if status["running"]:
         print("✓ Ollama Server läuft bereits")
     else:
         if not start_ollama_server():
             sys.exit(1)
+        status = check_readiness(model, check_installed=False)
 
     # Modell prüfen
     print()
-    if is_model_available(model):
-        print(f"✓ {model} ist verfügbar")
+    if status["loaded"]:
+        print(f"✓ {model} ist verfügbar (bereits geladen)")
+    elif status["available"]:
+        print(f"✓ {model} ist verfügbar (wird im Hintergrund vorgeladen)")
     else:
         print(f"○ {model} nicht gefunden")
         response = input(f"  Jetzt herunterladen? (ca. 14GB) [j/N]: ")
@@ -348,10 +682,10 @@ def main():
     try:
         from polylog_bridge import PolylogBridge, BridgeConfig
 
-        config = BridgeConfig(model=model, temperature=0.3)
+        config = BridgeConfig(model=model, temperature=0.3, keep_alive=KEEP_ALIVE)
         bridge = PolylogBridge(config)
 
-        # Direkt in interaktiven Modus
+        # Direkt in interaktiven Modus (lädt das Modell vor, während der User tippt)
         bridge.run_interactive()
 
     except ImportError as e: